@@ -1,11 +1,14 @@
 import streamlit as st
-import openai
-from langchain_openai import ChatOpenAI
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.prompts import ChatPromptTemplate
+import io
 import os
+import sys
 from dotenv import load_dotenv
-from langchain_groq import ChatGroq
+from langchain_huggingface import HuggingFaceEmbeddings
+# The shared package lives at the repo root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, os.pardir)))
+from cache import ResponseCache  # noqa: E402
+from qa import AUTO_MODEL, MAX_CONCURRENCY, answer_batch, generate_response, read_questions, write_answers  # noqa: E402
+from shared.router import MAX_CONCURRENT_CALLS, MODELS, describe_model_stats  # noqa: E402
 
 # Load environment variables from .env file
 load_dotenv()
@@ -16,41 +19,63 @@ os.environ["LANGCHAIN_API_KEY"] = os.getenv("LANGCHAIN_API_KEY")
 os.environ["LANGCHAIN_TRACING_V2"] = "true"
 os.environ["LANGCHAIN_PROJECT"] = os.getenv("LANGCHAIN_PROJECT")
 
-# Prompt Template
-prompt = ChatPromptTemplate.from_messages(
-    [
-        ("system", "You are a helpful assistant. Please respond to the user's queries."),
-        ("user", "Question: {question}")
-    ]
-)
-
-def generate_response(question, engine, temperature, max_tokens):
-    groq_api_key = os.environ["GROQ_API_KEY"]
-    llm = ChatGroq(model="Gemma2-9b-It", groq_api_key=groq_api_key)
-    output_parser = StrOutputParser()
-    chain = prompt | llm | output_parser
-    answer = chain.invoke({'question': question})
-    return answer
+
+@st.cache_resource
+def get_response_cache():
+    # Shared by all sessions; near-identical questions are matched with a local embedding model
+    embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
+    return ResponseCache(embed=embeddings.embed_query)
+
 
 st.title("Enhanced Q&A Chatbot With OpenAI")
 st.sidebar.title("Settings")
-api_key = st.sidebar.text_input("Enter your Groq AI API Key:", type="password")  
+api_key = st.sidebar.text_input("Enter your Groq AI API Key:", type="password")
 
-engine = st.sidebar.selectbox("Select model", ["GPT-4 Turbo", "GPT-4", "LLaMA 2 7B", "LLaMA 2 13B", "Claude 3"])
+# "Auto" sends each question to the fastest healthy model; a named model pins it
+engines = {"Auto (fastest available)": AUTO_MODEL, **{name: name for name in MODELS}}
+engine = engines[st.sidebar.selectbox("Select model", list(engines))]
 
 # Adjust response parameters
 temperature = st.sidebar.slider("Temperature", min_value=0.0, max_value=1.0, value=0.7)
 max_tokens = st.sidebar.slider("Max Tokens", min_value=50, max_value=300, value=150)
 
 # Main interface for user input
-st.write("Go ahead and ask any question")  
+st.write("Go ahead and ask any question")
 user_input = st.text_input("You:")
 
 if user_input and api_key:
-    response = generate_response(user_input, engine, temperature, max_tokens)  
+    response = generate_response(user_input, api_key, engine, temperature, max_tokens, get_response_cache())
     st.write(response)
 
 elif user_input:
-    st.warning("Please enter the Groq API Key in the sidebar")  
+    st.warning("Please enter the Groq API Key in the sidebar")
 else:
     st.write("Please provide user input")
+
+# Batch answering: a file of questions answered concurrently through the async batch API
+st.subheader("Batch questions")
+questions_file = st.file_uploader("Upload questions (.txt, one per line, or .csv with a 'question' column)", type=["txt", "csv"])
+max_concurrency = st.slider("Concurrent requests", min_value=1, max_value=MAX_CONCURRENT_CALLS, value=MAX_CONCURRENCY)
+
+if questions_file and st.button("Answer all questions"):
+    if not api_key:
+        st.warning("Please enter the Groq API Key in the sidebar")
+    else:
+        try:
+            questions = read_questions(questions_file.getvalue().decode("utf-8"), questions_file.name)
+        except ValueError as e:
+            st.error(str(e))
+            questions = []
+        if questions:
+            with st.spinner(f"Answering {len(questions)} questions..."):
+                answers = answer_batch(
+                    questions, api_key, engine, temperature, max_tokens, max_concurrency, get_response_cache()
+                )
+            output = io.StringIO()
+            write_answers(output, questions, answers)
+            failed = sum(isinstance(answer, Exception) for answer in answers)
+            st.success(f"Answered {len(questions) - failed} of {len(questions)} questions.")
+            st.download_button("Download answers", data=output.getvalue(), file_name="answers.csv", mime="text/csv")
+
+st.sidebar.caption(get_response_cache().describe_stats())
+st.sidebar.caption(describe_model_stats())
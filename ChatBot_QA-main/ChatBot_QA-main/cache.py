@@ -0,0 +1,112 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+# Response cache in front of the LLM. An exact match on the normalized question
+# is tried first, then a semantic match against the embeddings of cached
+# questions. Keys always include the model and sampling parameters, so an
+# answer is only reused for the settings that produced it.
+MAX_ENTRIES = 1000
+TTL_SECONDS = 6 * 3600
+SIMILARITY_THRESHOLD = 0.92
+
+
+def normalize_question(question):
+    question = re.sub(r"\s+", " ", question.strip().lower())
+    return question.rstrip("?!. ")
+
+
+class ResponseCache:
+    def __init__(self, embed=None, max_entries=MAX_ENTRIES, ttl_seconds=TTL_SECONDS,
+                 similarity_threshold=SIMILARITY_THRESHOLD):
+        # embed maps a question to its embedding; without it only exact matches are served
+        self.embed = embed
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0}
+
+    @property
+    def hit_rate(self):
+        hits = self.stats["exact_hits"] + self.stats["semantic_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _vector(self, question):
+        vector = np.asarray(self.embed(question), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _expire(self, now):
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if now - entry["created"] <= self.ttl_seconds:
+                # Entries are in LRU order, so an old entry may still sit behind a
+                # recently used one; those are dropped when they are looked up
+                break
+            del self._entries[key]
+
+    def lookup(self, question, params):
+        # Returns (answer, vector); answer is None on a miss and vector can be
+        # passed to store() so the question is not embedded twice
+        normalized = normalize_question(question)
+        key = (params, normalized)
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            entry = self._entries.get(key)
+            if entry is not None and now - entry["created"] <= self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.stats["exact_hits"] += 1
+                return entry["answer"], entry["vector"]
+            if entry is not None:
+                del self._entries[key]
+
+        if self.embed is None:
+            with self._lock:
+                self.stats["misses"] += 1
+            return None, None
+
+        vector = self._vector(normalized)
+        with self._lock:
+            candidates = [
+                (candidate_key, entry) for candidate_key, entry in self._entries.items()
+                if candidate_key[0] == params and entry["vector"] is not None
+                and now - entry["created"] <= self.ttl_seconds
+            ]
+            if candidates:
+                similarities = np.stack([entry["vector"] for _, entry in candidates]) @ vector
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.similarity_threshold:
+                    best_key, best_entry = candidates[best]
+                    self._entries.move_to_end(best_key)
+                    self.stats["semantic_hits"] += 1
+                    return best_entry["answer"], vector
+            self.stats["misses"] += 1
+        return None, vector
+
+    def store(self, question, params, answer, vector=None):
+        normalized = normalize_question(question)
+        if vector is None and self.embed is not None:
+            vector = self._vector(normalized)
+        with self._lock:
+            key = (params, normalized)
+            self._entries[key] = {"answer": answer, "vector": vector, "created": time.time()}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def describe_stats(self):
+        return (
+            f"Cache hit rate {self.hit_rate:.0%} ({self.stats['exact_hits']} exact, "
+            f"{self.stats['semantic_hits']} semantic, {self.stats['misses']} misses), "
+            f"{len(self)} entries"
+        )
@@ -0,0 +1,139 @@
+import argparse
+import asyncio
+import csv
+import io
+import os
+import sys
+import threading
+from functools import lru_cache
+
+from dotenv import load_dotenv
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+
+# The shared package lives at the repo root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, os.pardir)))
+
+from shared.router import create_routed_llm  # noqa: E402
+
+MODEL_NAME = "Gemma2-9b-It"
+AUTO_MODEL = "auto"  # route each question to the fastest healthy model
+MAX_CONCURRENCY = 8
+
+# Prompt Template
+prompt = ChatPromptTemplate.from_messages(
+    [
+        ("system", "You are a helpful assistant. Please respond to the user's queries."),
+        ("user", "Question: {question}")
+    ]
+)
+
+
+@lru_cache(maxsize=32)
+def get_chain(groq_api_key, model, temperature, max_tokens):
+    # One long-lived client per (model, temperature, max_tokens) so its HTTP
+    # connection pool is reused across questions. AUTO_MODEL routes over all
+    # configured models; any other name pins that model.
+    models = None if model == AUTO_MODEL else [model]
+    llm = create_routed_llm(
+        groq_api_key, models, primary=MODEL_NAME, temperature=temperature, max_tokens=max_tokens
+    )
+    return prompt | llm | StrOutputParser()
+
+
+def generate_response(question, groq_api_key, model=MODEL_NAME, temperature=0.7, max_tokens=150, cache=None):
+    params = (model, temperature, max_tokens)
+    if cache is not None:
+        answer, vector = cache.lookup(question, params)
+        if answer is not None:
+            return answer
+    chain = get_chain(groq_api_key, model, temperature, max_tokens)
+    answer = chain.invoke({'question': question})
+    if cache is not None:
+        cache.store(question, params, answer, vector)
+    return answer
+
+
+# The router answers abatch through the async Groq clients (see shared/router.py),
+# which keep their connections on the event loop that created them, so all
+# batch work runs on one long-lived loop in a background thread
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def _get_loop():
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="qa-batch-loop", daemon=True).start()
+        return _loop
+
+
+def answer_batch(questions, groq_api_key, model=MODEL_NAME, temperature=0.7, max_tokens=150,
+                 max_concurrency=MAX_CONCURRENCY, cache=None):
+    # Answers are returned in question order; a failed question yields its
+    # exception. Only questions the cache cannot answer are sent to the model.
+    params = (model, temperature, max_tokens)
+    answers = [None] * len(questions)
+    vectors = [None] * len(questions)
+    if cache is not None:
+        for idx, question in enumerate(questions):
+            answers[idx], vectors[idx] = cache.lookup(question, params)
+    misses = [idx for idx, answer in enumerate(answers) if answer is None]
+    if misses:
+        chain = get_chain(groq_api_key, model, temperature, max_tokens)
+        batch = chain.abatch(
+            [{'question': questions[idx]} for idx in misses],
+            config={"max_concurrency": max_concurrency},
+            return_exceptions=True,
+        )
+        for idx, answer in zip(misses, asyncio.run_coroutine_threadsafe(batch, _get_loop()).result()):
+            answers[idx] = answer
+            if cache is not None and not isinstance(answer, Exception):
+                cache.store(questions[idx], params, answer, vectors[idx])
+    return answers
+
+
+def read_questions(text, filename=""):
+    # One question per line, or a CSV file with a "question" column
+    if filename.lower().endswith(".csv"):
+        rows = csv.DictReader(io.StringIO(text))
+        column = next((name for name in rows.fieldnames or [] if name.strip().lower() == "question"), None)
+        if column is None:
+            raise ValueError("CSV files need a 'question' column")
+        return [row[column].strip() for row in rows if row[column] and row[column].strip()]
+    return [line.strip() for line in text.splitlines() if line.strip()]
+
+
+def write_answers(file, questions, answers):
+    writer = csv.writer(file)
+    writer.writerow(["question", "answer"])
+    for question, answer in zip(questions, answers):
+        writer.writerow([question, f"Error: {answer}" if isinstance(answer, Exception) else answer])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer a file of questions concurrently with Groq.")
+    parser.add_argument("questions", help="text file with one question per line, or CSV with a 'question' column")
+    parser.add_argument("--output", default="answers.csv", help="CSV file to write question/answer pairs to")
+    parser.add_argument("--model", default=AUTO_MODEL, help=f"a Groq model name, or '{AUTO_MODEL}' to route")
+    parser.add_argument("--temperature", type=float, default=0.7)
+    parser.add_argument("--max-tokens", type=int, default=150)
+    parser.add_argument("--concurrency", type=int, default=MAX_CONCURRENCY)
+    args = parser.parse_args()
+
+    load_dotenv()
+    with open(args.questions, encoding="utf-8") as file:
+        questions = read_questions(file.read(), args.questions)
+    answers = answer_batch(
+        questions, os.environ["GROQ_API_KEY"], args.model, args.temperature, args.max_tokens, args.concurrency
+    )
+    with open(args.output, "w", newline="", encoding="utf-8") as file:
+        write_answers(file, questions, answers)
+    failed = sum(isinstance(answer, Exception) for answer in answers)
+    print(f"Answered {len(questions) - failed} of {len(questions)} questions; results in {args.output}")
+
+
+if __name__ == "__main__":
+    main()
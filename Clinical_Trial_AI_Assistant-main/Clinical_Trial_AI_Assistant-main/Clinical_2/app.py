@@ -1,19 +1,54 @@
 import streamlit as st
-from langchain.agents import create_sql_agent
-from langchain.sql_database import SQLDatabase
-from langchain.agents.agent_types import AgentType
-from langchain.agents.agent_toolkits import SQLDatabaseToolkit
-from sqlalchemy import create_engine, text
 from sqlalchemy.exc import SQLAlchemyError
-from langchain_groq import ChatGroq
 import os
+import sys
 from dotenv import load_dotenv
+from langchain_huggingface import HuggingFaceEmbeddings
 import urllib.parse
-import pandas as pd
-from database import configure_db
-from prompts import (CLINICAL_TRIAL_PROMPTS, PROMPT_QUALITY_OF_LIFE, PROMPT_PLACEBO_EFFECT, PROMPT_ADVERSE_EVENT_DROPOUTS, PROMPT_DEMOGRAPHIC_IMPACT, PROMPT_DATA_INTEGRITY)
+# The shared package lives at the repo root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, os.pardir, os.pardir)))
+from shared.database import configure_db, get_sql_database  # noqa: E402
+from agent import build_guidance, build_query, create_agent  # noqa: E402
+from aggregates import AggregateRefresher  # noqa: E402
+from shared.browser import show_table_browser  # noqa: E402
+from shared.fast_sql import FastSQLError, LLMCallCounter, fast_answer  # noqa: E402
+from shared.plan_cache import PlanCache, SQLCapture, answer_from_plan  # noqa: E402
+from prompt_index import PromptIndex  # noqa: E402
+from shared.schema_index import SchemaIndex  # noqa: E402
+from shared.router import create_routed_llm, describe_model_stats  # noqa: E402
 
 load_dotenv()
+
+
+@st.cache_resource
+def get_embeddings():
+    # Local embedding model, loaded once and used to match questions to tables and prompts
+    return HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
+
+
+@st.cache_resource
+def get_schema_index(db_key):
+    return SchemaIndex(get_embeddings())
+
+
+@st.cache_resource
+def get_prompt_index():
+    # The guidance prompts are embedded once at startup
+    return PromptIndex(get_embeddings())
+
+
+@st.cache_resource
+def start_summary_tables(_engine, db_key):
+    # Set up before the schema is reflected, then refreshed in the background for the whole process
+    return AggregateRefresher(_engine).start()
+
+
+@st.cache_resource
+def get_plan_cache():
+    # SQL that answered earlier questions, shared by all sessions and kept across restarts
+    return PlanCache()
+
+
 groq_api_key = os.getenv("GROQ_API_KEY")
 
 st.set_page_config(page_title="Clinical Trial AI Assistant", page_icon="🧬")
@@ -33,17 +68,21 @@ except SQLAlchemyError as e:
     st.error(f"Error connecting to the database: {e}")
     st.stop()
 
-llm = ChatGroq(groq_api_key=groq_api_key, model_name="Llama3-8b-8192", streaming=True)
+# Routed to the fastest healthy model, Llama3 8B first until latencies are known
+llm = create_routed_llm(groq_api_key, primary="Llama3-8b-8192", streaming=True)
 
-db = SQLDatabase(engine)
-toolkit = SQLDatabaseToolkit(db=db, llm=llm)
+db_key = engine.url.render_as_string(hide_password=True)
+summaries = start_summary_tables(engine, db_key)
 
-agent = create_sql_agent(
-    llm=llm,
-    toolkit=toolkit,
-    verbose=True,
-    agent_type=AgentType.ZERO_SHOT_REACT_DESCRIPTION,
-)
+# The schema is reflected once per process and cached until it changes; the
+# summaries' bookkeeping tables are left out of it
+db = get_sql_database(engine, db_key, hidden_tables=tuple(summaries.internal_table_names))
+schema_index = get_schema_index(db_key)
+prompt_index = get_prompt_index()
+plan_cache = get_plan_cache()
+
+FAST_SQL_MODE = "Fast SQL (single pass)"
+AGENT_MODE = "SQL agent (step by step)"
 
 nav_option = st.sidebar.radio(
     "Navigation",
@@ -53,6 +92,11 @@ nav_option = st.sidebar.radio(
 if nav_option == "Ask AI about Clinical Trials":
     if "messages" not in st.session_state or st.sidebar.button("Clear message history"):
         st.session_state["messages"] = [{"role": "assistant", "content": "How can I assist you with your clinical trial queries?"}]
+    # Fast SQL answers in 2-3 LLM calls and falls back to the agent if its query keeps failing
+    answer_mode = st.sidebar.radio("Answer mode", [FAST_SQL_MODE, AGENT_MODE])
+    st.sidebar.caption(describe_model_stats())
+    st.sidebar.caption(plan_cache.describe_stats())
+    st.sidebar.caption(summaries.describe_status())
     
     for msg in st.session_state.messages:
         st.chat_message(msg["role"]).write(msg["content"])
@@ -65,13 +109,40 @@ if nav_option == "Ask AI about Clinical Trials":
 
         with st.chat_message("assistant"):
             try:
-                # Include all prompts in the response
-                all_prompts = "\n".join(CLASSICAL_TRIAL_PROMPTS + [CLINICAL_TRIAL_PROMPTS,PROMPT_QUALITY_OF_LIFE, PROMPT_PLACEBO_EFFECT,
-                                                                    PROMPT_ADVERSE_EVENT_DROPOUTS, 
-                                                                    PROMPT_DEMOGRAPHIC_IMPACT, 
-                                                                    PROMPT_DATA_INTEGRITY])
-                full_query = f"{user_query} Here are some relevant prompts: \n{all_prompts}"
-                response = agent.run(full_query)
+                # Guidance helps write the SQL; the plan cache and the answer go by the question alone
+                guidance = build_guidance(user_query, prompt_index, summaries.describe_for_agent())
+                counter = LLMCallCounter()
+                response = sql = None
+                # A question asked before against the same schema reuses its SQL
+                schema_version = db.schema_version
+                cached = answer_from_plan(llm, db, plan_cache, db_key, schema_version, user_query,
+                                          callbacks=[counter])
+                if cached:
+                    response, sql, result = cached
+                    st.caption("Answered from the plan cache")
+                else:
+                    # Only the tables relevant to the question are shown to the model
+                    tables = schema_index.relevant_tables(db, user_query)
+                    # Summary tables always come along, as the agent is asked to try them first
+                    tables = list(dict.fromkeys(summaries.table_names + tables))
+                    if answer_mode == FAST_SQL_MODE:
+                        try:
+                            response, sql, result = fast_answer(llm, db.scoped(tables), user_query, callbacks=[counter],
+                                                                guidance=guidance)
+                        except FastSQLError as e:
+                            st.caption(f"Fast SQL failed ({e}); asking the SQL agent instead")
+                    if response is None:
+                        capture = SQLCapture()
+                        agent = create_agent(llm, db, tables=tables)
+                        response = agent.run(build_query(user_query, guidance), callbacks=[counter, capture])
+                        sql, result = capture.sql, capture.result
+                    if sql:
+                        plan_cache.store(db_key, schema_version, user_query, sql, result, response)
+                    st.caption(f"Tables: {', '.join(tables)}")
+                if sql:
+                    with st.expander("SQL"):
+                        st.code(sql, language="sql")
+                st.caption(f"{counter.count} LLM calls")
                 st.session_state.messages.append({"role": "assistant", "content": response})
                 st.write(response)
             except Exception as e:
@@ -80,22 +151,7 @@ if nav_option == "Ask AI about Clinical Trials":
 elif nav_option == "View Clinical Trial Data":
     st.subheader("View Clinical Trial Data")
     try:
-        with engine.connect() as conn:
-            tables = conn.execute(text("SHOW TABLES")).fetchall()
-        
-        table_names = [table[0] for table in tables]
-        
-        selected_table = st.selectbox("Select a clinical trial table to view", table_names)
-        
-        if selected_table:
-            st.write(f"Showing data for table: {selected_table}")
-            query = text(f"SELECT * FROM `{selected_table}`")
-            with engine.connect() as conn:
-                data = conn.execute(query).fetchall()
-            
-            columns = [col[0] for col in conn.execute(text(f"SHOW COLUMNS FROM `{selected_table}`")).fetchall()]
-            df = pd.DataFrame(data, columns=columns)
-            st.dataframe(df)
-    
+        # Pages are fetched server-side, so large trial tables stay responsive
+        show_table_browser(engine, "Select a clinical trial table to view")
     except Exception as e:
         st.error(f"An error occurred: {str(e)}")
@@ -0,0 +1,47 @@
+import os
+
+import numpy as np
+
+from prompts import (CLINICAL_TRIAL_PROMPTS, PROMPT_QUALITY_OF_LIFE, PROMPT_PLACEBO_EFFECT, PROMPT_ADVERSE_EVENT_DROPOUTS, PROMPT_DEMOGRAPHIC_IMPACT, PROMPT_DATA_INTEGRITY)
+from shared.tokens import count_tokens
+
+# Index over the guidance prompts in prompts.py. The prompts are embedded once
+# at startup, and each question gets only the one or two closest to it, within
+# a token budget, instead of the whole library on every agent step.
+PROMPT_LIBRARY = CLINICAL_TRIAL_PROMPTS + [PROMPT_QUALITY_OF_LIFE, PROMPT_PLACEBO_EFFECT,
+                                           PROMPT_ADVERSE_EVENT_DROPOUTS, PROMPT_DEMOGRAPHIC_IMPACT,
+                                           PROMPT_DATA_INTEGRITY]
+MAX_PROMPTS = 2
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "200"))
+MIN_SIMILARITY = float(os.getenv("PROMPT_MIN_SIMILARITY", "0.3"))
+
+
+def _unit(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+
+class PromptIndex:
+    def __init__(self, embeddings, prompts=PROMPT_LIBRARY, max_prompts=MAX_PROMPTS,
+                 token_budget=PROMPT_TOKEN_BUDGET, min_similarity=MIN_SIMILARITY):
+        self.embeddings = embeddings
+        self.max_prompts = max_prompts
+        self.token_budget = token_budget
+        self.min_similarity = min_similarity
+        self.prompts = list(prompts)
+        self._matrix = _unit(embeddings.embed_documents(self.prompts))
+        self._tokens = [count_tokens(prompt) for prompt in self.prompts]
+
+    def relevant(self, question):
+        # Closest prompts first; ones that would overrun the budget are skipped
+        # in favour of shorter, less similar ones
+        scores = self._matrix @ _unit(self.embeddings.embed_query(question))
+        chosen, used = [], 0
+        for i in np.argsort(-scores):
+            if len(chosen) == self.max_prompts or scores[i] < self.min_similarity:
+                break
+            if used + self._tokens[i] <= self.token_budget:
+                chosen.append(self.prompts[i])
+                used += self._tokens[i]
+        return chosen
@@ -1,24 +1,44 @@
 import streamlit as st
-from langchain.chains import create_history_aware_retriever, create_retrieval_chain
-from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain_chroma import Chroma
-from langchain_community.chat_message_histories import ChatMessageHistory
 from langchain_core.chat_history import BaseChatMessageHistory
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_groq import ChatGroq
-from langchain_core.runnables.history import RunnableWithMessageHistory
 from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import PyPDFLoader
 import os
+import sys
 from dotenv import load_dotenv
-import pandas as pd
+# The shared package lives at the repo root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, os.pardir)))
+from chain import create_conversational_rag_chain  # noqa: E402
+from shared.history import (  # noqa: E402
+    DEFAULT_TOKEN_BUDGET, CompactingChatHistory, StoredChatHistory, create_summarize_chain, open_history_store,
+)
+from export import EXPORT_FORMATS, MIME_TYPES, export_rows  # noqa: E402
+from indexing import INDEX_DIR, get_vectorstore, hash_filter, index_uploaded_pdfs, iter_splits, search_splits  # noqa: E402
+from shared.packing import CHUNK_OVERLAP_TOKENS, CHUNK_TOKENS, DEFAULT_CONTEXT_BUDGET, RETRIEVAL_K, ContextPacker  # noqa: E402
+from shared.rewrite import RewriteCache, describe_stats  # noqa: E402
+from shared.router import create_routed_llm, describe_model_stats  # noqa: E402
+from shared.streaming import describe_source, describe_timings, stream_answer  # noqa: E402
 
 # Load environment variables
 load_dotenv()
 os.environ['HF_TOKEN'] = os.getenv("HF_TOKEN")
 embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
 
+
+@st.cache_resource
+def get_history_store():
+    # Chat histories persist across reruns, reconnects and worker processes
+    return open_history_store()
+
+
+@st.cache_resource
+def get_rewrite_cache():
+    # Shared by all sessions; keys include a digest of the chat history
+    return RewriteCache()
+
+
+TEST_CASE_COLUMNS = [
+    "Number", "Content Snippet", "Generated Test Case", "Related Content", "Query Based Action", "Test Steps",
+]
+
 # Streamlit app setup
 st.title("Conversational RAG with AI Test Case Generation")
 st.write("Upload FSD/BRD PDFs, generate test cases, and interact with content using AI.")
@@ -28,7 +48,15 @@ api_key = st.text_input("Enter your Groq API key:", type="password")
 
 # Check if Groq API Key is provided
 if api_key:
-    llm = ChatGroq(groq_api_key=api_key, model_name="Gemma2-9b-It")
+    # Routed to the fastest healthy model, Gemma2 first until latencies are known
+    llm = create_routed_llm(api_key, primary="Gemma2-9b-It")
+    history_token_budget = st.sidebar.number_input(
+        "Chat history token budget", min_value=128, max_value=8192, value=DEFAULT_TOKEN_BUDGET, step=128
+    )
+    context_token_budget = st.sidebar.number_input(
+        "Context token budget", min_value=256, max_value=8192, value=DEFAULT_CONTEXT_BUDGET, step=128
+    )
+    stream_answers = st.sidebar.checkbox("Stream answers", value=True)
 
     # Predefined Session IDs with passwords
     session_passwords = {
@@ -49,83 +77,42 @@ if api_key:
 
             uploaded_files = st.file_uploader("Choose a PDF file", type="pdf", accept_multiple_files=True)
 
-            # Process uploaded PDFs
-            def process_uploaded_pdfs(uploaded_files):
-                documents = []
-                for uploaded_file in uploaded_files:
-                    temp_pdf = f"./temp_{uploaded_file.name}"
-                    with open(temp_pdf, "wb") as file:
-                        file.write(uploaded_file.getvalue())
-                    
-                    loader = PyPDFLoader(temp_pdf)
-                    docs = loader.load()
-                    documents.extend(docs)
-                return documents
+            vectorstore = get_vectorstore(INDEX_DIR, embeddings)
 
             if uploaded_files:
+                # Only files not yet in the on-disk index are parsed and embedded
                 with st.spinner("Processing PDFs..."):
-                    documents = process_uploaded_pdfs(uploaded_files)
-
-                # Split and embed documents
-                text_splitter = RecursiveCharacterTextSplitter(chunk_size=5000, chunk_overlap=500)
-                splits = text_splitter.split_documents(documents)
-                vectorstore = Chroma.from_documents(documents=splits, embedding=embeddings)
-                retriever = vectorstore.as_retriever()
-
-                # Contextualize questions prompt
-                contextualize_q_system_prompt = (
-                    "Given a chat history and the latest user question "
-                    "which might reference context in the chat history, "
-                    "formulate a standalone question which can be understood "
-                    "without the chat history. Do NOT answer the question, "
-                    "just reformulate it if needed and otherwise return it as is."
-                )
-                contextualize_q_prompt = ChatPromptTemplate.from_messages([
-                    ("system", contextualize_q_system_prompt),
-                    MessagesPlaceholder("chat_history"),
-                    ("human", "{input}"),
-                ])
-
-                history_aware_retriever = create_history_aware_retriever(llm, retriever, contextualize_q_prompt)
-
-                # Q&A Prompt
-                system_prompt = (
-                    "You are an assistant for question-answering tasks. "
-                    "Use the following pieces of retrieved context to answer "
-                    "the question. If you don't know the answer, say that you "
-                    "don't know. Use three sentences maximum and keep the "
-                    "answer concise.\n\n"
-                    "{context}"
+                    file_hashes = index_uploaded_pdfs(
+                        vectorstore, uploaded_files, CHUNK_TOKENS, CHUNK_OVERLAP_TOKENS
+                    )
+                retriever = vectorstore.as_retriever(
+                    search_kwargs={"k": RETRIEVAL_K, "filter": hash_filter(file_hashes)}
                 )
-                qa_prompt = ChatPromptTemplate.from_messages([
-                    ("system", system_prompt),
-                    MessagesPlaceholder("chat_history"),
-                    ("human", "{input}"),
-                ])
 
-                question_answer_chain = create_stuff_documents_chain(llm, qa_prompt)
-                rag_chain = create_retrieval_chain(history_aware_retriever, question_answer_chain)
+                context_packer = ContextPacker(context_token_budget)
+
+                summarize_chain = create_summarize_chain(llm)
 
                 def get_session_history(session: str) -> BaseChatMessageHistory:
+                    # Prompts see recent turns within the token budget plus a summary of older ones
                     if session not in st.session_state.store:
-                        st.session_state.store[session] = ChatMessageHistory()
-                    return st.session_state.store[session]
-
-                conversational_rag_chain = RunnableWithMessageHistory(
-                    rag_chain,
-                    get_session_history,
-                    input_messages_key="input",
-                    history_messages_key="chat_history",
-                    output_messages_key="answer"
+                        st.session_state.store[session] = CompactingChatHistory(
+                            StoredChatHistory(get_history_store(), session)
+                        )
+                    history = st.session_state.store[session]
+                    history.configure(summarize_chain, history_token_budget)
+                    return history
+
+                conversational_rag_chain = create_conversational_rag_chain(
+                    llm, retriever, get_session_history, get_rewrite_cache(), context_packer
                 )
 
                 # AI Test Case Generation
                 def generate_test_cases_from_fsd(fsd_data, user_query):
                     # Tokenize and generate test cases based on user input query
-                    tokenized_data = [doc.page_content[:16384] for doc in fsd_data]  # Limit content to 16k tokens
-                    test_cases = []
+                    tokenized_data = (doc.page_content[:16384] for doc in fsd_data)  # Limit content to 16k tokens
                     
-                    # Generate test cases dynamically based on the user query
+                    # Generate test cases dynamically based on the user query, one row at a time
                     for idx, content in enumerate(tokenized_data, start=1):
                         # Extract relevant steps based on query
                         # Simple example: Split document content into steps or sections based on line breaks or other patterns
@@ -144,8 +131,8 @@ if api_key:
                                      "Step 2: Perform the necessary action based on the test case.", 
                                      "Step 3: Check the expected outcome based on the requirement."]
                         
-                        # Generate test case based on the query
-                        test_case = {
+                        # Generate test case based on the query; both content columns refer to the same string
+                        yield {
                             "Number": idx,
                             "Content Snippet": content,  # Show a snippet of the document as part of the test case
                             "Generated Test Case": f"Test Case {idx} based on query '{user_query}'",  # Dynamic based on query
@@ -153,35 +140,77 @@ if api_key:
                             "Query Based Action": user_query,  # The user query itself can be tied to the test case
                             "Test Steps": steps  # Add extracted steps
                         }
-                        
-                        # Append the dynamically generated test case
-                        test_cases.append(test_case)
-                    
-                    return test_cases
 
                 # User query input
                 user_query = st.text_input("Enter your query for generating test cases:")
+                test_case_scope = st.radio(
+                    "Generate test cases from:",
+                    ["Chunks relevant to the query", "All chunks"],
+                    horizontal=True,
+                )
+                if test_case_scope == "Chunks relevant to the query":
+                    top_k = st.number_input("Number of chunks (top-k):", min_value=1, max_value=100, value=10)
+                    score_threshold = st.slider("Minimum relevance score:", min_value=0.0, max_value=1.0, value=0.3)
+
+                export_format = st.selectbox("Export format:", list(EXPORT_FORMATS))
 
                 if st.button("Generate Test Cases from FSD/BRD"):
                     if user_query:
                         with st.spinner("Generating Test Cases..."):
+                            if test_case_scope == "Chunks relevant to the query":
+                                # Only the chunks the index ranks as relevant to the query
+                                splits = search_splits(vectorstore, user_query, file_hashes, top_k, score_threshold)
+                            else:
+                                splits = iter_splits(vectorstore, file_hashes)
                             test_cases = generate_test_cases_from_fsd(splits, user_query)
-                            # Save to Excel
-                            df = pd.DataFrame(test_cases)
-                            df.to_excel("Generated_Test_Cases_from_Query.xlsx", index=False)
-                            st.success("Test cases generated and saved as 'Generated_Test_Cases_from_Query.xlsx'.")
+                            # Rows are streamed to the export file as they are generated; the
+                            # session keeps only the finished file, which replaces any earlier one
+                            progress = st.empty()
+                            fmt = EXPORT_FORMATS[export_format]
+                            data = export_rows(
+                                test_cases, TEST_CASE_COLUMNS, fmt, "Generated_Test_Cases_from_Query",
+                                on_row=lambda count: progress.write(f"{count} test cases written..."),
+                            )
+                            st.session_state.test_case_export = {"data": data, "format": fmt}
+                            progress.empty()
+                            st.success("Test cases generated.")
                     else:
                         st.warning("Please enter a query to generate test cases.")
 
+                if "test_case_export" in st.session_state:
+                    export = st.session_state.test_case_export
+                    st.download_button(
+                        "Download test cases",
+                        data=export["data"],
+                        file_name=f"Generated_Test_Cases_from_Query.{export['format']}",
+                        mime=MIME_TYPES[export["format"]],
+                    )
+
                 # User question input
                 user_input = st.text_input("Your question:")
                 if user_input:
                     session_history = get_session_history(session_id)
-                    response = conversational_rag_chain.invoke(
-                        {"input": user_input},
-                        config={"configurable": {"session_id": session_id}},
-                    )
-                    st.write("Assistant:", response['answer'])
+                    config = {"configurable": {"session_id": session_id}}
+                    if stream_answers:
+                        # Sources appear once retrieval is done, then the answer streams in below them
+                        sources = st.empty()
+                        timings = {}
+                        st.write("Assistant:")
+                        st.write_stream(stream_answer(
+                            conversational_rag_chain, {"input": user_input}, config,
+                            on_context=lambda docs: sources.caption(
+                                "Sources: " + "; ".join(dict.fromkeys(describe_source(doc) for doc in docs))
+                            ),
+                            timings=timings,
+                        ))
+                        st.session_state.setdefault("timings", []).append(timings)
+                        st.caption(describe_timings(timings))
+                    else:
+                        response = conversational_rag_chain.invoke({"input": user_input}, config=config)
+                        st.write("Assistant:", response['answer'])
+                    st.caption(describe_stats(get_rewrite_cache()))
+                    st.caption(context_packer.describe_stats())
+                    st.caption(describe_model_stats())
 
         else:
             st.error("Invalid Session ID or Password.")
@@ -0,0 +1,106 @@
+import csv
+import os
+import tempfile
+
+from openpyxl import Workbook
+
+# Streaming export of generated test cases: rows are written as they are
+# produced, so the full result set is never held in memory.
+EXPORT_FORMATS = {
+    "Excel (.xlsx)": "xlsx",
+    "CSV (.csv)": "csv",
+    "Parquet (.parquet)": "parquet",
+}
+MIME_TYPES = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv",
+    "parquet": "application/octet-stream",
+}
+PARQUET_BATCH_SIZE = 500
+PROGRESS_EVERY = 50  # rows between on_row calls, so progress is not redrawn for every row
+
+
+def _cell(value):
+    if isinstance(value, (list, tuple)):
+        return "\n".join(value)
+    return value
+
+
+def _write_xlsx(path, columns, rows, on_row):
+    # Write-only workbooks flush each row; repeated strings such as the chunk
+    # text in "Content Snippet" and "Related Content" go to the shared-strings
+    # table once and are referenced by index from every cell
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(columns)
+    for count, row in enumerate(rows, start=1):
+        sheet.append([_cell(row[column]) for column in columns])
+        on_row(count)
+    workbook.save(path)
+
+
+def _write_csv(path, columns, rows, on_row):
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(columns)
+        for count, row in enumerate(rows, start=1):
+            writer.writerow([_cell(row[column]) for column in columns])
+            on_row(count)
+
+
+def _write_parquet(path, columns, rows, on_row):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    batch = {column: [] for column in columns}
+    count = 0
+
+    def flush():
+        nonlocal writer
+        table = pa.Table.from_pydict(batch)
+        if writer is None:
+            # Dictionary encoding stores repeated chunk text once per row group
+            writer = pq.ParquetWriter(path, table.schema, use_dictionary=True)
+        writer.write_table(table)
+        for values in batch.values():
+            values.clear()
+
+    try:
+        for count, row in enumerate(rows, start=1):
+            for column in columns:
+                batch[column].append(_cell(row[column]))
+            on_row(count)
+            if count % PARQUET_BATCH_SIZE == 0:
+                flush()
+        if count % PARQUET_BATCH_SIZE or writer is None:
+            flush()
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+WRITERS = {
+    "xlsx": _write_xlsx,
+    "csv": _write_csv,
+    "parquet": _write_parquet,
+}
+
+
+def export_rows(rows, columns, fmt, file_stem, on_row=lambda count: None, progress_every=PROGRESS_EVERY):
+    # Streams rows into a temporary file and returns the finished file's
+    # bytes. The file is always removed, so nothing is left behind when the
+    # session ends; only the encoded export is kept in memory.
+    handle, path = tempfile.mkstemp(prefix=f"{file_stem}_", suffix=f".{fmt}")
+    os.close(handle)
+
+    def report(count):
+        if count % progress_every == 0:
+            on_row(count)
+
+    try:
+        WRITERS[fmt](path, columns, rows, report)
+        with open(path, "rb") as file:
+            return file.read()
+    finally:
+        os.remove(path)
@@ -0,0 +1,113 @@
+import hashlib
+import os
+
+import streamlit as st
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+
+from shared.ingestion import iter_pdf_pages, iter_split_batches
+from shared.packing import token_text_splitter
+
+# On-disk index shared by every session of this app
+INDEX_DIR = os.getenv("FSD_INDEX_DIR", "./fsd_brd_index")
+COLLECTION_NAME = "fsd_brd"
+
+
+@st.cache_resource
+def get_vectorstore(persist_directory, _embeddings):
+    return Chroma(
+        collection_name=COLLECTION_NAME,
+        embedding_function=_embeddings,
+        persist_directory=persist_directory,
+    )
+
+
+def file_digest(data, chunk_tokens, chunk_overlap_tokens):
+    # Same bytes split with the same settings always map to the same chunks
+    digest = hashlib.sha256()
+    digest.update(f"tokens:{chunk_tokens}:{chunk_overlap_tokens}:".encode())
+    digest.update(data)
+    return digest.hexdigest()
+
+
+def hash_filter(file_hashes):
+    if len(file_hashes) == 1:
+        return {"file_hash": file_hashes[0]}
+    return {"file_hash": {"$in": list(file_hashes)}}
+
+
+def _marker_path(index_dir, file_hash):
+    return os.path.join(index_dir, "complete", file_hash)
+
+
+def is_indexed(file_hash, index_dir=INDEX_DIR):
+    # The marker is written after the file's last chunk is stored, so a file
+    # whose indexing was cut short is indexed again. Its chunks have the same
+    # ids, so the partial ones are overwritten.
+    return os.path.exists(_marker_path(index_dir, file_hash))
+
+
+def mark_indexed(file_hash, chunk_count, index_dir=INDEX_DIR):
+    path = _marker_path(index_dir, file_hash)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(str(chunk_count))
+
+
+def index_uploaded_pdfs(vectorstore, uploaded_files, chunk_tokens, chunk_overlap_tokens, index_dir=INDEX_DIR):
+    # Returns the content hashes of the uploaded files; only files that are not
+    # already on disk are parsed and embedded
+    text_splitter = token_text_splitter(chunk_tokens, chunk_overlap_tokens)
+    known = st.session_state.setdefault("indexed_files", {})
+    file_hashes = []
+    new_files = []
+    hashed = {}
+    for uploaded_file in uploaded_files:
+        file_key = (uploaded_file.file_id, chunk_tokens, chunk_overlap_tokens)
+        file_hash = known.get(file_key)
+        if file_hash is None:
+            file_hash = file_digest(uploaded_file.getvalue(), chunk_tokens, chunk_overlap_tokens)
+            if not is_indexed(file_hash, index_dir) and file_hash not in hashed.values():
+                new_files.append((uploaded_file.name, uploaded_file.getvalue(), {"file_hash": file_hash}))
+            hashed[file_key] = file_hash
+        file_hashes.append(file_hash)
+
+    chunk_counts = {}
+    for batch in iter_split_batches(iter_pdf_pages(new_files), text_splitter):
+        ids = []
+        for split in batch:
+            file_hash = split.metadata["file_hash"]
+            split.metadata["chunk"] = chunk_counts.get(file_hash, 0)
+            chunk_counts[file_hash] = split.metadata["chunk"] + 1
+            ids.append(f"{file_hash}-{split.metadata['chunk']}")
+        vectorstore.add_documents(batch, ids=ids)
+    for _, _, metadata in new_files:
+        mark_indexed(metadata["file_hash"], chunk_counts.get(metadata["file_hash"], 0), index_dir)
+    # Remembered for the session only once they are complete
+    known.update(hashed)
+    return file_hashes
+
+
+def iter_splits(vectorstore, file_hashes, page_size=256):
+    # Read the stored chunks back page by page, in document order, without
+    # re-embedding or loading the whole corpus at once
+    for file_hash in file_hashes:
+        offset = 0
+        while True:
+            ids = [f"{file_hash}-{chunk}" for chunk in range(offset, offset + page_size)]
+            stored = vectorstore.get(ids=ids, include=["documents", "metadatas"])
+            if not stored["ids"]:
+                break
+            page = sorted(zip(stored["documents"], stored["metadatas"]), key=lambda item: item[1]["chunk"])
+            for text, metadata in page:
+                yield Document(page_content=text, metadata=metadata)
+            offset += page_size
+
+
+def search_splits(vectorstore, query, file_hashes, k, score_threshold):
+    # Top-k chunks of the uploaded files for the query, best first, dropping
+    # anything below the relevance threshold
+    results = vectorstore.similarity_search_with_relevance_scores(
+        query, k=k, filter=hash_filter(file_hashes)
+    )
+    return [doc for doc, score in results if score >= score_threshold]
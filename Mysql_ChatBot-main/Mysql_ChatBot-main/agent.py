@@ -0,0 +1,43 @@
+from langchain.agents import create_sql_agent
+from langchain.agents.agent_types import AgentType
+from langchain.agents.agent_toolkits import SQLDatabaseToolkit
+from langchain.agents.mrkl.prompt import FORMAT_INSTRUCTIONS
+from langchain_community.agent_toolkits.sql.prompt import SQL_PREFIX
+from langchain_core.prompts import PromptTemplate
+
+# The SQL agent, kept free of Streamlit so it can also be driven headlessly (see benchmarks/)
+
+# Used when the relevant tables are picked up front (see schema_index.py):
+# their schema is filled in from the toolkit, which also drops the list-tables
+# and schema tools, so the agent goes straight to writing the query
+PRUNED_SCHEMA = """The tables relevant to the question are: {table_names}
+Their schema, with a few sample rows:
+
+{table_info}"""
+
+PRUNED_SUFFIX = """Begin!
+
+Question: {input}
+Thought: The schema of the relevant tables is above, so I can write the query.
+{agent_scratchpad}"""
+
+PRUNED_PROMPT = PromptTemplate.from_template(
+    "\n\n".join([SQL_PREFIX, PRUNED_SCHEMA, "{tools}", FORMAT_INSTRUCTIONS, PRUNED_SUFFIX])
+)
+
+
+def create_agent(llm, db, verbose=True, tables=None):
+    # Without tables the agent explores the whole database itself
+    if tables is None:
+        toolkit = SQLDatabaseToolkit(db=db, llm=llm)
+        prompt = None
+    else:
+        toolkit = SQLDatabaseToolkit(db=db.scoped(tables), llm=llm)
+        prompt = PRUNED_PROMPT
+    return create_sql_agent(
+        llm=llm,
+        toolkit=toolkit,
+        verbose=verbose,
+        agent_type=AgentType.ZERO_SHOT_REACT_DESCRIPTION,
+        prompt=prompt,
+    )
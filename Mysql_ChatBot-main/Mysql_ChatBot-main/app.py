@@ -1,20 +1,36 @@
 import streamlit as st
-from langchain.agents import create_sql_agent
-from langchain.sql_database import SQLDatabase
-from langchain.agents.agent_types import AgentType
-from langchain.callbacks import StreamlitCallbackHandler
-from langchain.agents.agent_toolkits import SQLDatabaseToolkit
-from sqlalchemy import create_engine, text
-from sqlalchemy.exc import SQLAlchemyError
-from langchain_groq import ChatGroq
 import os
+import sys
 from dotenv import load_dotenv
+from langchain_huggingface import HuggingFaceEmbeddings
 import urllib.parse
-import pandas as pd
+# The shared package lives at the repo root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, os.pardir)))
+from agent import create_agent  # noqa: E402
+from shared.browser import show_table_browser  # noqa: E402
+from shared.database import configure_db, get_sql_database  # noqa: E402
+from shared.fast_sql import FastSQLError, LLMCallCounter, fast_answer  # noqa: E402
+from shared.plan_cache import PlanCache, SQLCapture, answer_from_plan  # noqa: E402
+from shared.schema_index import SchemaIndex  # noqa: E402
+from shared.router import create_routed_llm, describe_model_stats  # noqa: E402
 
 # Load environment variables from .env file
 load_dotenv()
 
+
+@st.cache_resource
+def get_schema_index(db_key):
+    # Shared by all sessions; tables are matched to questions with a local embedding model
+    embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
+    return SchemaIndex(embeddings)
+
+
+@st.cache_resource
+def get_plan_cache():
+    # SQL that answered earlier questions, shared by all sessions and kept across restarts
+    return PlanCache()
+
+
 # Set the API keys environment variables
 groq_api_key = os.getenv("GROQ_API_KEY")
 langsmith_key = os.getenv("LANGCHAIN_SQL_APIKEY")  # Load LangSmith API key
@@ -40,45 +56,20 @@ if not langsmith_key:
 # Encode special characters in the password
 mysql_password = urllib.parse.quote_plus(mysql_password)
 
-# LLM model
-llm = ChatGroq(groq_api_key=groq_api_key, model_name="Llama3-8b-8192", streaming=True)
+# LLM model, routed to the fastest healthy model (Llama3 8B first until latencies are known)
+llm = create_routed_llm(groq_api_key, primary="Llama3-8b-8192", streaming=True)
 
-@st.cache_resource(ttl="2h")
-def configure_db(mysql_host, mysql_port, mysql_user, mysql_password, mysql_db):
-    if not (mysql_host and mysql_user and mysql_password and mysql_db):
-        st.error("Please provide all MySQL connection details.")
-        st.stop()
-    
-    try:
-        # Create SQLAlchemy engine for MySQL
-        connection_string = f"mysql+mysqlconnector://{mysql_user}:{mysql_password}@{mysql_host}:{mysql_port}/{mysql_db}"
-        engine = create_engine(connection_string)
-        with engine.connect() as conn:
-            # Test the connection by executing a simple query
-            result = conn.execute(text("SELECT 1"))
-            if result.fetchone() is None:
-                raise Exception("Failed to execute test query.")
-        
-        return engine
-    except SQLAlchemyError as e:
-        st.error(f"SQLAlchemy Error: {str(e)}")
-        st.stop()
-    except Exception as e:
-        st.error(f"Error: {str(e)}")
-        st.stop()
 engine = configure_db(mysql_host, mysql_port, mysql_user, mysql_password, mysql_db)
 
-# Toolkit
-db = SQLDatabase(engine)
-toolkit = SQLDatabaseToolkit(db=db, llm=llm)
+# Toolkit; the schema is reflected once per process and cached until it changes
+db_key = engine.url.render_as_string(hide_password=True)
+db = get_sql_database(engine, db_key)
 
-# Create the SQL agent with monitoring integration (update callback as needed)
-agent = create_sql_agent(
-    llm=llm,
-    toolkit=toolkit,
-    verbose=True,
-    agent_type=AgentType.ZERO_SHOT_REACT_DESCRIPTION,
-)
+schema_index = get_schema_index(db_key)
+plan_cache = get_plan_cache()
+
+FAST_SQL_MODE = "Fast SQL (single pass)"
+AGENT_MODE = "SQL agent (step by step)"
 
 # Sidebar navigation
 nav_option = st.sidebar.radio(
@@ -90,6 +81,10 @@ if nav_option == "Chat with Database":
     
     if "messages" not in st.session_state or st.sidebar.button("Clear message history"):
         st.session_state["messages"] = [{"role": "assistant", "content": "How can I help you?"}]
+    # Fast SQL answers in 2-3 LLM calls and falls back to the agent if its query keeps failing
+    answer_mode = st.sidebar.radio("Answer mode", [FAST_SQL_MODE, AGENT_MODE])
+    st.sidebar.caption(describe_model_stats())
+    st.sidebar.caption(plan_cache.describe_stats())
 
     # Display message history
     for msg in st.session_state.messages:
@@ -104,8 +99,35 @@ if nav_option == "Chat with Database":
 
         with st.chat_message("assistant"):
             try:
-                # Run the query through the SQL agent
-                response = agent.run(user_query)
+                counter = LLMCallCounter()
+                response = sql = None
+                # A question asked before against the same schema reuses its SQL
+                schema_version = db.schema_version
+                cached = answer_from_plan(llm, db, plan_cache, db_key, schema_version, user_query,
+                                          callbacks=[counter])
+                if cached:
+                    response, sql, result = cached
+                    st.caption("Answered from the plan cache")
+                else:
+                    # Only the tables relevant to the question are shown to the model
+                    tables = schema_index.relevant_tables(db, user_query)
+                    if answer_mode == FAST_SQL_MODE:
+                        try:
+                            response, sql, result = fast_answer(llm, db.scoped(tables), user_query, callbacks=[counter])
+                        except FastSQLError as e:
+                            st.caption(f"Fast SQL failed ({e}); asking the SQL agent instead")
+                    if response is None:
+                        capture = SQLCapture()
+                        agent = create_agent(llm, db, tables=tables)
+                        response = agent.run(user_query, callbacks=[counter, capture])
+                        sql, result = capture.sql, capture.result
+                    if sql:
+                        plan_cache.store(db_key, schema_version, user_query, sql, result, response)
+                    st.caption(f"Tables: {', '.join(tables)}")
+                if sql:
+                    with st.expander("SQL"):
+                        st.code(sql, language="sql")
+                st.caption(f"{counter.count} LLM calls")
                 st.session_state.messages.append({"role": "assistant", "content": response})
                 st.write(response)
             except Exception as e:
@@ -115,28 +137,7 @@ elif nav_option == "View Table Data":
     st.subheader("View Table Data")
 
     try:
-        # Fetch table names
-        with engine.connect() as conn:
-            tables = conn.execute(text("SHOW TABLES")).fetchall()
-        
-        table_names = [table[0] for table in tables]
-        
-        selected_table = st.selectbox("Select a table to view", table_names)
-        
-        if selected_table:
-            st.write(f"Showing data for table: {selected_table}")
-            
-            # Fetch table data
-            query = text(f"SELECT * FROM `{selected_table}`")
-            with engine.connect() as conn:
-                data = conn.execute(query).fetchall()
-            
-            # Display data in a DataFrame
-            with engine.connect() as conn:
-                columns_query = text(f"SHOW COLUMNS FROM `{selected_table}`")
-                columns = [col[0] for col in conn.execute(columns_query).fetchall()]
-            df = pd.DataFrame(data, columns=columns)
-            st.dataframe(df)
-    
+        # Pages are fetched server-side, so large tables stay responsive
+        show_table_browser(engine)
     except Exception as e:
         st.error(f"An error occurred: {str(e)}")
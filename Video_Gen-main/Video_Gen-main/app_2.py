@@ -1,26 +1,59 @@
 import streamlit as st
-from langchain.chains import create_history_aware_retriever, create_retrieval_chain
-from langchain.chains.combine_documents import create_stuff_documents_chain
 from langchain_chroma import Chroma
-from langchain_community.chat_message_histories import ChatMessageHistory
 from langchain_core.chat_history import BaseChatMessageHistory
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_groq import ChatGroq
-from langchain_core.runnables.history import RunnableWithMessageHistory
 from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import PyPDFLoader
 import os
-import moviepy as mp
-import speech_recognition as sr
-from fpdf import FPDF
+import sys
+import uuid
 from dotenv import load_dotenv
+# The shared package lives at the repo root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, os.pardir)))
+from chain import create_conversational_rag_chain  # noqa: E402
+from shared.history import (  # noqa: E402
+    DEFAULT_TOKEN_BUDGET, CompactingChatHistory, StoredChatHistory, create_summarize_chain, open_history_store,
+)
+from shared.ingestion import iter_pdf_pages, iter_split_batches  # noqa: E402
+from jobs import VideoJobRunner, job_key, video_digest  # noqa: E402
+from shared.packing import DEFAULT_CONTEXT_BUDGET, RETRIEVAL_K, ContextPacker, token_text_splitter  # noqa: E402
+from shared.rewrite import RewriteCache, describe_stats  # noqa: E402
+from shared.router import create_routed_llm, describe_model_stats  # noqa: E402
+from shared.streaming import describe_source, describe_timings, stream_answer  # noqa: E402
+from transcription import BACKENDS, format_transcript, transcript_documents  # noqa: E402
 
 load_dotenv()
 
 os.environ['HF_TOKEN'] = os.getenv("HF_TOKEN")
 embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
 
+
+@st.cache_resource
+def get_history_store():
+    # Chat histories persist across reruns and worker processes
+    return open_history_store()
+
+
+@st.cache_resource
+def get_rewrite_cache():
+    # Shared by all sessions; keys include a digest of the chat history
+    return RewriteCache()
+
+
+@st.cache_resource
+def get_job_runner():
+    # One runner per process, so a video is processed once however many sessions ask for it
+    return VideoJobRunner()
+
+
+@st.fragment(run_every=1)
+def show_video_job(job):
+    # Only this fragment reruns while the job is in progress; the whole page
+    # reruns once it finishes so the transcript gets indexed
+    if job.status == "running":
+        st.progress(job.progress, text=job.message)
+    else:
+        st.rerun()
+
+
 # Set up Streamlit UI
 st.title("Conversational RAG With Video and PDF Uploads")
 st.write("Upload PDFs, videos, and chat with their content")
@@ -30,7 +63,16 @@ api_key = st.text_input("Enter your Groq API key:", type="password")
 
 # Check if Groq API key is provided
 if api_key:
-    llm = ChatGroq(groq_api_key=api_key, model_name="Gemma2-9b-It")
+    # Routed to the fastest healthy model, Gemma2 first until latencies are known
+    llm = create_routed_llm(api_key, primary="Gemma2-9b-It")
+    history_token_budget = st.sidebar.number_input(
+        "Chat history token budget", min_value=128, max_value=8192, value=DEFAULT_TOKEN_BUDGET, step=128
+    )
+    context_token_budget = st.sidebar.number_input(
+        "Context token budget", min_value=256, max_value=8192, value=DEFAULT_CONTEXT_BUDGET, step=128
+    )
+    stream_answers = st.sidebar.checkbox("Stream answers", value=True)
+    transcription_backend = st.sidebar.selectbox("Transcription backend", list(BACKENDS))
 
     # Chat interface
     # Removed session_id input as per your request
@@ -38,136 +80,159 @@ if api_key:
     # State to manage chat history
     if 'store' not in st.session_state:
         st.session_state.store = {}
+    # The persisted history is keyed by a session id kept in the page URL, so
+    # reloading the page or reopening the link picks the conversation back up
+    if 'chat_session_id' not in st.session_state:
+        if "session" not in st.query_params:
+            st.query_params["session"] = uuid.uuid4().hex
+        st.session_state.chat_session_id = st.query_params["session"]
 
     uploaded_files = st.file_uploader("Choose PDF file(s)", type="pdf", accept_multiple_files=True)
 
+    # Video Upload and Audio Extraction
+    video_file = st.file_uploader("Upload a Video (MP4 format)", type=["mp4"])
+
+    # PDF chunks and video transcripts share one vector store per browser session
+    if 'vectorstore' not in st.session_state:
+        st.session_state.vectorstore = Chroma(
+            collection_name=f"session_{uuid.uuid4().hex}", embedding_function=embeddings
+        )
+        st.session_state.indexed_files = set()
+    vectorstore = st.session_state.vectorstore
+
     # Process uploaded PDFs
     if uploaded_files:
-        documents = []
-        for uploaded_file in uploaded_files:
-            temppdf = f"./temp.pdf"
-            with open(temppdf, "wb") as file:
-                file.write(uploaded_file.getvalue())
-                file_name = uploaded_file.name
-
-            loader = PyPDFLoader(temppdf)
-            docs = loader.load()
-            documents.extend(docs)
-
-        # Split and create embeddings for the documents
-        text_splitter = RecursiveCharacterTextSplitter(chunk_size=5000, chunk_overlap=500)
-        splits = text_splitter.split_documents(documents)
-        vectorstore = Chroma.from_documents(documents=splits, embedding=embeddings)
-        retriever = vectorstore.as_retriever()
-
-        # Contextualize question prompt
-        contextualize_q_system_prompt = (
-            "Given a chat history and the latest user question, "
-            "which might reference context in the chat history, "
-            "formulate a standalone question which can be understood "
-            "without the chat history. Do NOT answer the question, "
-            "just reformulate it if needed and otherwise return it as is."
-        )
-        contextualize_q_prompt = ChatPromptTemplate.from_messages(
-            [
-                ("system", contextualize_q_system_prompt),
-                MessagesPlaceholder("chat_history"),
-                ("human", "{input}"),
-            ]
-        )
-        
-        history_aware_retriever = create_history_aware_retriever(llm, retriever, contextualize_q_prompt)
-
-        # Answer question
-        system_prompt = (
-            "You are an assistant for question-answering tasks. "
-            "Use the following pieces of retrieved context to answer "
-            "the question. If you don't know the answer, say that you "
-            "don't know. Use three sentences maximum and keep the "
-            "answer concise."
-            "\n\n"
-            "{context}"
-        )
-        qa_prompt = ChatPromptTemplate.from_messages(
-            [
-                ("system", system_prompt),
-                MessagesPlaceholder("chat_history"),
-                ("human", "{input}"),
+        # Parse in parallel from memory and embed the chunks in bounded batches; files
+        # already indexed in this session are skipped
+        new_files = [
+            uploaded_file for uploaded_file in uploaded_files
+            if uploaded_file.file_id not in st.session_state.indexed_files
+        ]
+        if new_files:
+            text_splitter = token_text_splitter()
+            pdf_files = [
+                (uploaded_file.name, uploaded_file.getvalue(), {"file_id": uploaded_file.file_id})
+                for uploaded_file in new_files
             ]
-        )
-        
-        question_answer_chain = create_stuff_documents_chain(llm, qa_prompt)
-        rag_chain = create_retrieval_chain(history_aware_retriever, question_answer_chain)
+            for batch in iter_split_batches(iter_pdf_pages(pdf_files), text_splitter):
+                vectorstore.add_documents(batch)
+            st.session_state.indexed_files.update(uploaded_file.file_id for uploaded_file in new_files)
+
+    # Videos are processed once per content hash and transcription backend by a
+    # background job; reruns and repeat uploads are served from the job cache
+    video_result = None
+    if video_file:
+        runner = get_job_runner()
+        video_digests = st.session_state.setdefault("video_digests", {})
+        if video_file.file_id not in video_digests:
+            video_digests[video_file.file_id] = video_digest(video_file.getvalue())
+        video_key = job_key(video_digests[video_file.file_id], transcription_backend)
+        video_result = runner.load(video_key)
+        if video_result is None:
+            video_job = runner.submit(
+                video_key, video_file.name, video_file.getvalue(), BACKENDS[transcription_backend]
+            )
+            if video_job.status == "running":
+                show_video_job(video_job)
+            elif video_job.status == "failed":
+                st.error(f"Error: {video_job.error}")
+                if st.button("Retry video processing"):
+                    runner.discard(video_key)
+                    st.rerun()
+            else:
+                video_result = runner.load(video_key)
+
+    if video_result is not None:
+        if video_result["no_audio"]:
+            st.write("No audio found in the video.")
+        else:
+            if video_key not in st.session_state.indexed_files:
+                # Transcript chunks carry their time range and go straight into the vector store
+                transcript_docs = transcript_documents(video_result["segments"], video_result["name"])
+                for doc in transcript_docs:
+                    doc.metadata["file_id"] = video_key
+                if transcript_docs:
+                    vectorstore.add_documents(transcript_docs)
+                st.session_state.indexed_files.add(video_key)
+
+            st.write("Transcription of Audio:")
+            st.text(format_transcript(video_result["segments"]))
+            # The PDF is an optional export, rendered in the background on request and then cached
+            pdf_exports = st.session_state.setdefault("pdf_exports", {})
+            pdf_path = runner.artifact_path(video_key, "transcript.pdf")
+            export = pdf_exports.get(video_key)
+            if export is None and not os.path.exists(pdf_path):
+                if st.button("Export transcript as PDF"):
+                    pdf_exports[video_key] = runner.export_pdf(video_key)
+                    st.rerun()
+            elif export is not None and not export.done():
+                st.caption("The transcript PDF is being generated...")
+            elif export is not None and export.exception():
+                st.error(f"Error: {export.exception()}")
+                del pdf_exports[video_key]
+            else:
+                with open(pdf_path, "rb") as file:
+                    st.download_button(
+                        "Download transcript PDF", data=file,
+                        file_name=f"{os.path.splitext(video_result['name'])[0]}.pdf", mime="application/pdf",
+                    )
+
+    # Only files still in the uploaders are searched; removed ones stay in the
+    # collection but are filtered out
+    current_files = [uploaded_file.file_id for uploaded_file in uploaded_files or []]
+    if video_result is not None and not video_result["no_audio"]:
+        current_files.append(video_key)
+
+    if current_files:
+        if len(current_files) == 1:
+            file_filter = {"file_id": current_files[0]}
+        else:
+            file_filter = {"file_id": {"$in": current_files}}
+        retriever = vectorstore.as_retriever(search_kwargs={"k": RETRIEVAL_K, "filter": file_filter})
+
+        context_packer = ContextPacker(context_token_budget)
+
+        summarize_chain = create_summarize_chain(llm)
 
         def get_session_history() -> BaseChatMessageHistory:
             # Removed session_id input and used default
+            # Prompts see recent turns within the token budget plus a summary of older ones
             if 'default_session' not in st.session_state.store:
-                st.session_state.store['default_session'] = ChatMessageHistory()
-            return st.session_state.store['default_session']
+                st.session_state.store['default_session'] = CompactingChatHistory(
+                    StoredChatHistory(get_history_store(), st.session_state.chat_session_id)
+                )
+            history = st.session_state.store['default_session']
+            history.configure(summarize_chain, history_token_budget)
+            return history
         
-        conversational_rag_chain = RunnableWithMessageHistory(
-            rag_chain, get_session_history,
-            input_messages_key="input",
-            history_messages_key="chat_history",
-            output_messages_key="answer"
+        conversational_rag_chain = create_conversational_rag_chain(
+            llm, retriever, get_session_history, get_rewrite_cache(), context_packer
         )
 
         user_input = st.text_input("Your question:")
         if user_input:
             session_history = get_session_history()
-            response = conversational_rag_chain.invoke(
-                {"input": user_input},
-                config={"configurable": {"session_id": "default_session"}},
-            )
-            st.write("Assistant:", response['answer'])
-
-    # Video Upload and Audio Extraction
-    video_file = st.file_uploader("Upload a Video (MP4 format)", type=["mp4"])
-
-    if video_file:
-        temp_video_path = f"./temp_video.mp4"
-        with open(temp_video_path, "wb") as video:
-            video.write(video_file.getvalue())
-
-        # Extract audio from video
-        my_vid = mp.VideoFileClip(temp_video_path)
-
-        if my_vid.audio:
-            st.write("Audio track found. Extracting audio...")
-            audio_path = "my_result.wav"
-            my_vid.audio.write_audiofile(audio_path)
-            st.write("Audio extracted successfully.")
-
-            # Speech Recognition to Convert Audio to Text
-            def audio_to_text(file):
-                try:
-                    with sr.AudioFile(file) as source:
-                        recognizer = sr.Recognizer()
-                        audio_data = recognizer.record(source)
-                        return recognizer.recognize_google(audio_data)
-                except Exception as e:
-                    return f"Error: {e}"
-
-            audio_text = audio_to_text(audio_path)
-            st.write("Transcription of Audio:", audio_text)
-
-            # Convert transcribed text to PDF
-            def text_to_pdf(text, output_file):
-                pdf = FPDF()
-                pdf.set_auto_page_break(auto=True, margin=15)
-                pdf.add_page()
-                pdf.set_font("Arial", size=12)
-
-                for line in text.splitlines():
-                    pdf.multi_cell(0, 10, line)
-
-                pdf.output(output_file)
-
-            output_pdf = "transcribed_text.pdf"
-            text_to_pdf(audio_text, output_pdf)
-            st.write(f"PDF created successfully and saved as {output_pdf}")
-        else:
-            st.write("No audio found in the video.")
+            config = {"configurable": {"session_id": "default_session"}}
+            if stream_answers:
+                # Sources appear once retrieval is done, then the answer streams in below them
+                sources = st.empty()
+                timings = {}
+                st.write("Assistant:")
+                st.write_stream(stream_answer(
+                    conversational_rag_chain, {"input": user_input}, config,
+                    on_context=lambda docs: sources.caption(
+                        "Sources: " + "; ".join(dict.fromkeys(describe_source(doc) for doc in docs))
+                    ),
+                    timings=timings,
+                ))
+                st.session_state.setdefault("timings", []).append(timings)
+                st.caption(describe_timings(timings))
+            else:
+                response = conversational_rag_chain.invoke({"input": user_input}, config=config)
+                st.write("Assistant:", response['answer'])
+            st.caption(describe_stats(get_rewrite_cache()))
+            st.caption(context_packer.describe_stats())
+            st.caption(describe_model_stats())
 
 else:
     st.warning("Please enter the Groq API Key.")
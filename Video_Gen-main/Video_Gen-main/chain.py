@@ -0,0 +1,62 @@
+from langchain.chains import create_retrieval_chain
+from langchain.chains.combine_documents import create_stuff_documents_chain
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.runnables.history import RunnableWithMessageHistory
+
+from shared.rewrite import create_fast_history_aware_retriever
+
+# The conversational RAG chain, kept free of Streamlit so it can also be
+# driven headlessly (see benchmarks/)
+
+# Contextualize question prompt
+contextualize_q_system_prompt = (
+    "Given a chat history and the latest user question, "
+    "which might reference context in the chat history, "
+    "formulate a standalone question which can be understood "
+    "without the chat history. Do NOT answer the question, "
+    "just reformulate it if needed and otherwise return it as is."
+)
+contextualize_q_prompt = ChatPromptTemplate.from_messages(
+    [
+        ("system", contextualize_q_system_prompt),
+        MessagesPlaceholder("chat_history"),
+        ("human", "{input}"),
+    ]
+)
+
+# Answer question
+system_prompt = (
+    "You are an assistant for question-answering tasks. "
+    "Use the following pieces of retrieved context to answer "
+    "the question. If you don't know the answer, say that you "
+    "don't know. Use three sentences maximum and keep the "
+    "answer concise. When a piece of context starts with a time "
+    "range such as [01:05-01:40], cite that time range."
+    "\n\n"
+    "{context}"
+)
+qa_prompt = ChatPromptTemplate.from_messages(
+    [
+        ("system", system_prompt),
+        MessagesPlaceholder("chat_history"),
+        ("human", "{input}"),
+    ]
+)
+
+
+def create_conversational_rag_chain(llm, retriever, get_session_history, rewrite_cache, context_packer):
+    # Skips the rewrite LLM call on first turns and standalone questions, and memoizes the rest
+    history_aware_retriever = create_fast_history_aware_retriever(
+        llm, retriever, contextualize_q_prompt, rewrite_cache
+    )
+    question_answer_chain = create_stuff_documents_chain(llm, qa_prompt)
+    # Fill {context} with the most relevant, non-overlapping chunks up to the token budget
+    rag_chain = create_retrieval_chain(
+        history_aware_retriever | context_packer.as_runnable(), question_answer_chain
+    )
+    return RunnableWithMessageHistory(
+        rag_chain, get_session_history,
+        input_messages_key="input",
+        history_messages_key="chat_history",
+        output_messages_key="answer"
+    )
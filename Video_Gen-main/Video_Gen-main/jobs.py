@@ -0,0 +1,178 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import imageio_ffmpeg
+from fpdf import FPDF
+
+from transcription import NoAudioTrackError, Segment, format_timestamp, format_transcript, iter_video_pcm, transcribe
+
+# Background video processing. Each video is processed once per content hash
+# and transcription backend; its transcript is persisted under CACHE_DIR/<key>/
+# and served from there on every later rerun or repeat upload. The transcript
+# PDF is only rendered when a user asks to export it. Finished jobs are
+# dropped from memory, as their results are on disk; failed ones are kept,
+# up to MAX_FAILED_JOBS, so their error can be shown until a retry.
+CACHE_DIR = os.getenv("VIDEO_CACHE_DIR", "./video_cache")
+MAX_JOBS = 2
+MAX_FAILED_JOBS = 100
+
+
+def video_digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def job_key(digest, backend_name):
+    # Backends transcribe differently, so each gets its own cache entry
+    return hashlib.sha256(f"{digest}:{backend_name}".encode()).hexdigest()
+
+
+# Convert transcribed text to PDF
+def text_to_pdf(text, output_file):
+    pdf = FPDF()
+    pdf.set_auto_page_break(auto=True, margin=15)
+    pdf.add_page()
+    pdf.set_font("Arial", size=12)
+
+    for line in text.splitlines():
+        pdf.multi_cell(0, 10, line)
+
+    pdf.output(output_file)
+
+
+def _probe_duration(video_path):
+    # Reads only the container header; progress is left unknown if that fails
+    try:
+        frames = imageio_ffmpeg.read_frames(video_path)
+        try:
+            return next(frames).get("duration") or 0.0
+        finally:
+            frames.close()
+    except Exception:
+        return 0.0
+
+
+class VideoJob:
+    def __init__(self, key, name):
+        self.key = key
+        self.name = name
+        self.status = "running"
+        self.progress = 0.0
+        self.message = "Queued..."
+        self.error = None
+
+
+class VideoJobRunner:
+    def __init__(self, cache_dir=CACHE_DIR, max_jobs=MAX_JOBS):
+        self.cache_dir = cache_dir
+        self._executor = ThreadPoolExecutor(max_workers=max_jobs, thread_name_prefix="video-job")
+        # Exports get their own worker, so they never wait behind a transcription
+        self._export_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="transcript-pdf")
+        self._jobs = {}
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def artifact_path(self, key, name):
+        return os.path.join(self.cache_dir, key, name)
+
+    def load(self, key):
+        # Returns the cached result, or None if the video has not been processed
+        try:
+            with open(self.artifact_path(key, "transcript.json"), encoding="utf-8") as file:
+                result = json.load(file)
+        except FileNotFoundError:
+            return None
+        result["segments"] = [Segment(*segment) for segment in result["segments"]]
+        return result
+
+    def submit(self, key, name, data, backend):
+        # One job per content hash, however many sessions upload the same video
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is None and os.path.exists(self.artifact_path(key, "transcript.json")):
+                # Finished between the caller's load() and now; a job leaves
+                # _jobs only after its transcript is on disk
+                job = VideoJob(key, name)
+                job.status, job.progress = "done", 1.0
+            elif job is None:
+                job = VideoJob(key, name)
+                self._jobs[key] = job
+                self._executor.submit(self._run, job, data, backend)
+            return job
+
+    def export_pdf(self, key):
+        # Renders the transcript PDF in the background; the future returns its path
+        return self._export_executor.submit(self._render_pdf, key)
+
+    def _render_pdf(self, key):
+        path = self.artifact_path(key, "transcript.pdf")
+        if not os.path.exists(path):
+            with open(self.artifact_path(key, "transcript.txt"), encoding="utf-8") as file:
+                text = file.read()
+            handle, temp_path = tempfile.mkstemp(suffix=".pdf", dir=os.path.dirname(path))
+            os.close(handle)
+            text_to_pdf(text, temp_path)
+            os.replace(temp_path, path)
+        return path
+
+    def discard(self, key):
+        # Forget a finished or failed job so the next submit starts a new one
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and job.status != "running":
+                del self._jobs[key]
+
+    def _run(self, job, data, backend):
+        try:
+            with tempfile.TemporaryDirectory(prefix="video_gen_") as scratch:
+                video_path = os.path.join(scratch, "upload.mp4")
+                with open(video_path, "wb") as video:
+                    video.write(data)
+                duration = _probe_duration(video_path)
+
+                def on_segment(segment):
+                    job.message = f"Transcribed up to {format_timestamp(segment.end)}..."
+                    if duration:
+                        job.progress = min(segment.end / duration, 1.0)
+
+                job.message = "Extracting and transcribing the audio track..."
+                try:
+                    segments = transcribe(iter_video_pcm(video_path), backend, on_segment=on_segment)
+                    no_audio = False
+                except NoAudioTrackError:
+                    segments, no_audio = [], True
+
+            self._persist(job, segments, no_audio, backend.name)
+            job.progress = 1.0
+            job.status = "done"
+            with self._lock:
+                # load() serves it from disk from now on
+                self._jobs.pop(job.key, None)
+        except Exception as e:
+            job.error = str(e)
+            job.status = "failed"
+            with self._lock:
+                failed = [key for key, other in self._jobs.items() if other.status == "failed"]
+                for key in failed[:-MAX_FAILED_JOBS]:
+                    del self._jobs[key]
+
+    def _persist(self, job, segments, no_audio, backend_name):
+        directory = os.path.join(self.cache_dir, job.key)
+        os.makedirs(directory, exist_ok=True)
+        text = format_transcript(segments)
+        with open(os.path.join(directory, "transcript.txt"), "w", encoding="utf-8") as file:
+            file.write(text)
+        # transcript.json is written last and atomically; its presence marks the entry complete
+        result = {
+            "name": job.name,
+            "backend": backend_name,
+            "no_audio": no_audio,
+            "segments": [list(segment) for segment in segments],
+        }
+        temp_path = os.path.join(directory, "transcript.json.tmp")
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(result, file)
+        os.replace(temp_path, os.path.join(directory, "transcript.json"))
@@ -0,0 +1,239 @@
+import multiprocessing
+import subprocess
+import tempfile
+import wave
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import imageio_ffmpeg
+import numpy as np
+import speech_recognition as sr
+from langchain_core.documents import Document
+
+from shared.packing import CHUNK_TOKENS
+from shared.tokens import count_tokens
+
+# Transcription engine: 16 kHz mono 16-bit PCM is cut into silence-aligned
+# segments, the segments are transcribed concurrently by a pluggable backend
+# and the results are stitched back together in order with timestamps.
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2
+FRAME_MS = 30
+SILENCE_DBFS = -40.0
+MIN_SILENCE_MS = 300
+MIN_SEGMENT_SECONDS = 5.0
+MAX_SEGMENT_SECONDS = 30.0
+MAX_WORKERS = 4
+
+Segment = namedtuple("Segment", ["index", "start", "end", "text"])
+
+
+class GoogleBackend:
+    # Google Web Speech API; network bound, so segments run on threads
+    name = "Google Web Speech (online)"
+    local = False
+
+    def transcribe(self, pcm, sample_rate):
+        try:
+            return sr.Recognizer().recognize_google(sr.AudioData(pcm, sample_rate, SAMPLE_WIDTH))
+        except sr.UnknownValueError:
+            return ""
+
+
+class SphinxBackend:
+    # CMU PocketSphinx; runs offline and CPU bound, so segments run in processes
+    name = "PocketSphinx (offline)"
+    local = True
+
+    def transcribe(self, pcm, sample_rate):
+        try:
+            return sr.Recognizer().recognize_sphinx(sr.AudioData(pcm, sample_rate, SAMPLE_WIDTH))
+        except sr.UnknownValueError:
+            return ""
+
+
+BACKENDS = {backend.name: backend for backend in (GoogleBackend(), SphinxBackend())}
+
+
+class NoAudioTrackError(Exception):
+    pass
+
+
+def iter_video_pcm(video_path, chunk_seconds=1.0):
+    # Decodes only the audio track with ffmpeg, straight to 16 kHz mono PCM on
+    # a pipe, so no intermediate WAV file is written
+    command = [
+        imageio_ffmpeg.get_ffmpeg_exe(), "-nostdin", "-loglevel", "error",
+        "-i", video_path, "-vn", "-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "s16le", "-",
+    ]
+    chunk_bytes = int(SAMPLE_RATE * chunk_seconds) * SAMPLE_WIDTH
+    # stderr goes to a file, not a pipe: an unread pipe that fills up would
+    # block ffmpeg while we wait on stdout
+    errors = tempfile.TemporaryFile()
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=errors)
+    received = False
+    try:
+        while True:
+            data = process.stdout.read(chunk_bytes)
+            if not data:
+                break
+            received = True
+            yield data
+        returncode = process.wait()
+        errors.seek(0)
+        stderr = errors.read().decode(errors="replace")
+        if returncode != 0 and not received:
+            if "does not contain any stream" in stderr or "matches no streams" in stderr:
+                raise NoAudioTrackError(video_path)
+            raise RuntimeError(f"ffmpeg failed: {stderr.strip()}")
+        if not received:
+            raise NoAudioTrackError(video_path)
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+        errors.close()
+
+
+def iter_wav_pcm(path, chunk_seconds=1.0):
+    with wave.open(path, "rb") as wav:
+        if (wav.getnchannels(), wav.getsampwidth(), wav.getframerate()) != (1, SAMPLE_WIDTH, SAMPLE_RATE):
+            raise ValueError(f"{path} must be {SAMPLE_RATE} Hz mono 16-bit PCM")
+        chunk_frames = int(SAMPLE_RATE * chunk_seconds)
+        while True:
+            data = wav.readframes(chunk_frames)
+            if not data:
+                break
+            yield data
+
+
+def _frame_dbfs(frame):
+    samples = np.frombuffer(frame, dtype=np.int16).astype(np.float32)
+    rms = np.sqrt(np.mean(samples * samples)) if samples.size else 0.0
+    return 20 * np.log10(rms / 32768 + 1e-10)
+
+
+def iter_segments(pcm_chunks, sample_rate=SAMPLE_RATE):
+    # Yields (start, end, pcm) with times in seconds. A segment is closed at the
+    # first pause of MIN_SILENCE_MS once it is MIN_SEGMENT_SECONDS long, and
+    # unconditionally at MAX_SEGMENT_SECONDS. Fully silent segments are dropped.
+    frame_bytes = sample_rate * SAMPLE_WIDTH * FRAME_MS // 1000
+    bytes_per_second = sample_rate * SAMPLE_WIDTH
+    min_silence_frames = MIN_SILENCE_MS // FRAME_MS
+    pending = b""
+    segment = bytearray()
+    start = 0.0
+    silent_run = 0
+    voiced = False
+
+    def close():
+        nonlocal segment, start, voiced
+        end = start + len(segment) / bytes_per_second
+        result = (start, end, bytes(segment)) if voiced else None
+        segment, start, voiced = bytearray(), end, False
+        return result
+
+    for chunk in pcm_chunks:
+        pending += chunk
+        offset = 0
+        while len(pending) - offset >= frame_bytes:
+            frame = pending[offset:offset + frame_bytes]
+            offset += frame_bytes
+            segment += frame
+            if _frame_dbfs(frame) < SILENCE_DBFS:
+                silent_run += 1
+            else:
+                silent_run = 0
+                voiced = True
+            duration = len(segment) / bytes_per_second
+            if (duration >= MIN_SEGMENT_SECONDS and silent_run >= min_silence_frames) or duration >= MAX_SEGMENT_SECONDS:
+                result = close()
+                if result:
+                    yield result
+        pending = pending[offset:]
+
+    segment += pending
+    if segment:
+        result = close()
+        if result:
+            yield result
+
+
+def _transcribe_segment(backend, index, start, end, pcm, sample_rate):
+    return Segment(index, start, end, backend.transcribe(pcm, sample_rate).strip())
+
+
+def transcribe(pcm_chunks, backend, sample_rate=SAMPLE_RATE, max_workers=MAX_WORKERS, on_segment=None):
+    # At most 2 * max_workers segments are buffered at any time; results come
+    # back in audio order
+    if backend.local:
+        # Spawned, not forked, as forking a threaded server is unsafe (see
+        # shared/ingestion.py)
+        executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+    else:
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+    segments = []
+    with executor:
+        in_flight = deque()
+
+        def collect():
+            segment = in_flight.popleft().result()
+            segments.append(segment)
+            if on_segment:
+                on_segment(segment)
+
+        for index, (start, end, pcm) in enumerate(iter_segments(pcm_chunks, sample_rate)):
+            in_flight.append(executor.submit(_transcribe_segment, backend, index, start, end, pcm, sample_rate))
+            if len(in_flight) >= 2 * max_workers:
+                collect()
+        while in_flight:
+            collect()
+    return segments
+
+
+def format_timestamp(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes:02d}:{seconds:02d}"
+
+
+def stitch(segments):
+    return " ".join(segment.text for segment in segments if segment.text)
+
+
+def format_transcript(segments):
+    return "\n".join(
+        f"[{format_timestamp(segment.start)}-{format_timestamp(segment.end)}] {segment.text}"
+        for segment in segments
+        if segment.text
+    )
+
+
+def transcript_documents(segments, source, chunk_tokens=CHUNK_TOKENS):
+    # Groups consecutive segments into chunks of about chunk_tokens; each chunk
+    # starts with its time range so answers can cite it
+    documents = []
+    group, tokens = [], 0
+
+    def flush():
+        start, end = group[0].start, group[-1].end
+        documents.append(Document(
+            page_content=f"[{format_timestamp(start)}-{format_timestamp(end)}] " + stitch(group),
+            metadata={"source": source, "start": start, "end": end},
+        ))
+
+    for segment in segments:
+        if not segment.text:
+            continue
+        segment_tokens = count_tokens(segment.text)
+        if group and tokens + segment_tokens > chunk_tokens:
+            flush()
+            group, tokens = [], 0
+        group.append(segment)
+        tokens += segment_tokens
+    if group:
+        flush()
+    return documents
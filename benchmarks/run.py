@@ -0,0 +1,225 @@
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+from stub_server import DEFAULT_LATENCY, DEFAULT_RESPONSE_TOKENS, DEFAULT_TOKEN_RATE, start_server
+
+# Load-test benchmark for all apps against the local stub LLM. Each app runs
+# in its own process (the apps share module names such as history.py), while
+# the stub server runs here, so its work is not counted in the app's numbers.
+#
+#   python benchmarks/run.py --requests 50 --concurrency 4
+#   python benchmarks/run.py --apps fsd_rag --json after.json --compare before.json
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_REQUESTS = 40
+DEFAULT_CONCURRENCY = 4
+REGRESSION_TOLERANCE = 0.2
+SCENARIO_TIMEOUT_SECONDS = 1800
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    rank = (len(values) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (rank - low)
+
+
+def summarize(name, latencies, errors, wall, peak_bytes=None):
+    return {
+        "stage": name,
+        "count": len(latencies),
+        "errors": errors,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+        "throughput": len(latencies) / wall if wall else 0.0,
+        "peak_mib": peak_bytes / 2 ** 20 if peak_bytes is not None else None,
+    }
+
+
+class Bench:
+    def __init__(self, requests, concurrency, track_memory):
+        self.requests = requests
+        self.concurrency = concurrency
+        self.track_memory = track_memory
+        self.results = []
+        self.notes = []
+        self.first_error = {}
+
+    def note(self, text):
+        self.notes.append(text)
+
+    def stage(self, name, fn, requests=None, concurrency=None):
+        # Calls fn(idx) for idx in range(requests) on `concurrency` threads. fn
+        # may return a dict of sub-stage timings in seconds (e.g. retrieval,
+        # ttft), which are reported as "<stage>.<key>" rows.
+        requests = self.requests if requests is None else requests
+        concurrency = self.concurrency if concurrency is None else concurrency
+        latencies, sub_timings, errors = [], {}, 0
+
+        def timed(idx):
+            start = time.perf_counter()
+            result = fn(idx)
+            return time.perf_counter() - start, result
+
+        if self.track_memory:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for future in [executor.submit(timed, idx) for idx in range(requests)]:
+                try:
+                    elapsed, result = future.result()
+                except Exception as e:
+                    errors += 1
+                    self.first_error.setdefault(name, repr(e))
+                    continue
+                latencies.append(elapsed)
+                for key, value in (result or {}).items():
+                    sub_timings.setdefault(key, []).append(value)
+        wall = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] - baseline if self.track_memory else None
+
+        self.results.append(summarize(name, latencies, errors, wall, peak))
+        for key, values in sub_timings.items():
+            self.results.append(summarize(f"{name}.{key}", values, 0, wall))
+
+
+def _run_app(app, options, stub_url, reports):
+    # Runs in a fresh process with the app's directory first on sys.path,
+    # followed by the repo root for the shared package. Any failure, including
+    # an import error, is sent back as the report.
+    bench = Bench(options["requests"], options["concurrency"], options["track_memory"])
+    try:
+        sys.path.insert(0, REPO_ROOT)
+        from scenarios import SCENARIOS
+
+        app_dir, scenario = SCENARIOS[app]
+        sys.path.insert(0, os.path.join(REPO_ROOT, app_dir))
+        os.environ["GROQ_API_BASE"] = stub_url
+        os.environ["GROQ_API_KEY"] = "stub"
+        os.environ["LANGCHAIN_TRACING_V2"] = "false"
+        # Deprecation notices from the apps' imports would bury the report
+        warnings.simplefilter("ignore")
+
+        if bench.track_memory:
+            tracemalloc.start()
+        with tempfile.TemporaryDirectory(prefix=f"bench_{app}_") as workdir:
+            scenario(bench, workdir)
+        reports.put({"results": bench.results, "notes": bench.notes, "errors": bench.first_error})
+    except Exception as e:
+        reports.put({"results": bench.results, "notes": bench.notes, "errors": bench.first_error,
+                     "failed": repr(e)})
+
+
+def run_app(app, options, server, stub_url):
+    context = multiprocessing.get_context("spawn")
+    reports = context.Queue()
+    llm_calls = server.request_count
+    process = context.Process(target=_run_app, args=(app, options, stub_url, reports))
+    process.start()
+    deadline = time.monotonic() + SCENARIO_TIMEOUT_SECONDS
+    while True:
+        try:
+            report = reports.get(timeout=1)
+            break
+        except queue.Empty:
+            # A process that died without reporting (a crash in native code,
+            # or killed) or hangs would otherwise block the run for good
+            if not process.is_alive():
+                failed = f"process exited with code {process.exitcode} without a report"
+            elif time.monotonic() > deadline:
+                process.terminate()
+                failed = f"timed out after {SCENARIO_TIMEOUT_SECONDS:g} s"
+            else:
+                continue
+            report = {"results": [], "notes": [], "errors": {}, "failed": failed}
+            break
+    process.join()
+    if process.exitcode and "failed" not in report:
+        report["failed"] = f"process exited with code {process.exitcode}"
+    report["llm_calls"] = server.request_count - llm_calls
+    return report
+
+
+def format_report(app, report):
+    lines = [f"== {app} ({report['llm_calls']} stub LLM calls)"]
+    lines.append(f"{'stage':<28}{'n':>6}{'err':>5}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>9}{'peak MiB':>10}")
+    for row in report["results"]:
+        peak = f"{row['peak_mib']:.1f}" if row["peak_mib"] is not None else "-"
+        lines.append(
+            f"{row['stage']:<28}{row['count']:>6}{row['errors']:>5}{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}"
+            f"{row['p99_ms']:>10.1f}{row['throughput']:>9.2f}{peak:>10}"
+        )
+    lines.extend(f"  {note}" for note in report["notes"])
+    lines.extend(f"  first error in {stage}: {error}" for stage, error in report["errors"].items())
+    if "failed" in report:
+        lines.append(f"  scenario failed: {report['failed']}")
+    return "\n".join(lines)
+
+
+def compare(reports, baseline, tolerance):
+    # Stages whose p95 grew by more than the tolerance over the baseline run
+    regressions = []
+    for app, report in reports.items():
+        previous = {row["stage"]: row for row in baseline.get("apps", {}).get(app, {}).get("results", [])}
+        for row in report["results"]:
+            before = previous.get(row["stage"])
+            if before and before["p95_ms"] and row["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+                regressions.append(f"{app}/{row['stage']}: p95 {before['p95_ms']:.1f} -> {row['p95_ms']:.1f} ms")
+    return regressions
+
+
+def main():
+    from scenarios import SCENARIOS
+
+    parser = argparse.ArgumentParser(description="Benchmark the apps against a local deterministic stub LLM.")
+    parser.add_argument("--apps", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=DEFAULT_REQUESTS, help="requests per stage")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--latency", type=float, default=DEFAULT_LATENCY, help="stub seconds before the first token")
+    parser.add_argument("--token-rate", type=float, default=DEFAULT_TOKEN_RATE, help="stub tokens per second")
+    parser.add_argument("--response-tokens", type=int, default=DEFAULT_RESPONSE_TOKENS)
+    parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc (it slows Python code down)")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--compare", help="baseline JSON from an earlier run; exit 1 on p95 regressions")
+    parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE)
+    args = parser.parse_args()
+
+    server, stub_url = start_server(latency=args.latency, token_rate=args.token_rate,
+                                    response_tokens=args.response_tokens)
+    options = {"requests": args.requests, "concurrency": args.concurrency, "track_memory": not args.no_memory}
+    reports = {}
+    for app in args.apps:
+        reports[app] = run_app(app, options, server, stub_url)
+        print(format_report(app, reports[app]), flush=True)
+    server.shutdown()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump({"options": {**options, "latency": args.latency, "token_rate": args.token_rate,
+                                   "response_tokens": args.response_tokens}, "apps": reports}, file, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            regressions = compare(reports, json.load(file), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
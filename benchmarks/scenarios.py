@@ -0,0 +1,435 @@
+import itertools
+import math
+import os
+import random
+import sqlite3
+import struct
+import time
+
+# Headless drivers for each app. A scenario runs with its app directory first
+# on sys.path and the repo root after it (see run.py), builds the app's own
+# chain or agent against the stub LLM and times its pipeline stages through
+# bench.stage(). Vector stores use deterministic fake embeddings in memory, so
+# no model is downloaded and the numbers cover our code rather than the
+# embedding model.
+MODEL_NAME = "Gemma2-9b-It"
+SQL_MODEL_NAME = "Llama3-8b-8192"
+EMBEDDING_SIZE = 384
+# Unrelated tables added to the SQL databases, so the agents face a wide schema
+FILLER_TABLES = 100
+
+QUESTIONS = [
+    "What are the login requirements for the customer portal?",
+    "Which steps are needed to reset a password?",
+    "How are failed payments retried?",
+    "What does the system do when a session expires?",
+    "Which reports can an administrator export?",
+    "How is the audit log retained?",
+    "What validations apply to the registration form?",
+    "How are notifications delivered to users?",
+]
+# Follow-ups refer back to the previous turn, so they go through the rewrite step
+FOLLOW_UPS = [
+    "Can you explain that in more detail?",
+    "What happens if it fails?",
+    "Who is responsible for it?",
+]
+
+FEATURES = ["login", "password reset", "payment retry", "session timeout", "report export", "audit log",
+            "registration", "notifications", "user roles", "search"]
+
+
+def _embeddings():
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    return DeterministicFakeEmbedding(size=EMBEDDING_SIZE)
+
+
+def _llm(model=MODEL_NAME, **kwargs):
+    # Routed over all models like the apps; they all resolve to the stub
+    from shared.router import create_routed_llm
+    return create_routed_llm(os.environ["GROQ_API_KEY"], primary=model, **kwargs)
+
+
+def _question(idx):
+    # Every fourth request is a follow-up in the same session
+    if idx % 4 == 3:
+        return FOLLOW_UPS[idx % len(FOLLOW_UPS)]
+    return QUESTIONS[idx % len(QUESTIONS)]
+
+
+def requirement_pages(file_idx, pages=10):
+    # Deterministic FSD/BRD-like text: numbered requirements with test steps
+    rng = random.Random(file_idx)
+    for page in range(pages):
+        lines = [f"Section {file_idx}.{page + 1} Functional requirements"]
+        for req in range(8):
+            feature = rng.choice(FEATURES)
+            lines.append(
+                f"REQ-{file_idx}-{page}-{req}: The system shall support {feature} for all users. "
+                f"The {feature} flow must complete within {rng.randint(1, 9)} seconds and record an audit event."
+            )
+            lines.extend(f"Step {step}: Verify the {feature} behaviour for case {step}." for step in range(1, 4))
+        yield "\n".join(lines)
+
+
+def make_pdf(pages):
+    from fpdf import FPDF
+    pdf = FPDF()
+    pdf.set_auto_page_break(auto=True, margin=15)
+    pdf.set_font("Arial", size=10)
+    for text in pages:
+        pdf.add_page()
+        for line in text.splitlines():
+            pdf.multi_cell(0, 5, line)
+    return pdf.output(dest="S").encode("latin-1")
+
+
+def _history_factory(workdir, llm, token_budget):
+    from shared.history import CompactingChatHistory, StoredChatHistory, create_summarize_chain, open_history_store
+    store = open_history_store("sqlite", os.path.join(workdir, "chat_history.db"))
+    summarize_chain = create_summarize_chain(llm)
+    histories = {}
+
+    def get_session_history(session):
+        if session not in histories:
+            histories[session] = CompactingChatHistory(StoredChatHistory(store, session))
+        history = histories[session]
+        history.configure(summarize_chain, token_budget)
+        return history
+
+    return get_session_history
+
+
+def _chat_stages(bench, vectorstore, workdir, sessions=8):
+    # The conversational RAG chain as the app builds it, driven through the
+    # same streaming path; retrieval, first token and total are recorded per request
+    from chain import create_conversational_rag_chain
+    from shared.history import DEFAULT_TOKEN_BUDGET
+    from shared.packing import DEFAULT_CONTEXT_BUDGET, RETRIEVAL_K, ContextPacker
+    from shared.rewrite import RewriteCache
+    from shared.streaming import stream_answer
+
+    llm = _llm()
+    retriever = vectorstore.as_retriever(search_kwargs={"k": RETRIEVAL_K})
+    chain = create_conversational_rag_chain(
+        llm, retriever, _history_factory(workdir, llm, DEFAULT_TOKEN_BUDGET), RewriteCache(),
+        ContextPacker(DEFAULT_CONTEXT_BUDGET),
+    )
+
+    def chat(idx):
+        timings = {}
+        config = {"configurable": {"session_id": f"bench-{idx % sessions}"}}
+        for _ in stream_answer(chain, {"input": _question(idx)}, config, on_context=lambda docs: None,
+                               timings=timings):
+            pass
+        return timings
+
+    def invoke(idx):
+        config = {"configurable": {"session_id": f"bench-invoke-{idx % sessions}"}}
+        chain.invoke({"input": _question(idx)}, config=config)
+
+    bench.stage("chat_stream", chat)
+    bench.stage("chat_invoke", invoke)
+
+
+def fsd_rag(bench, workdir, files=4):
+    from langchain_core.vectorstores import InMemoryVectorStore
+    from shared.ingestion import iter_pdf_pages, iter_split_batches
+    from shared.packing import token_text_splitter
+
+    vectorstore = InMemoryVectorStore(_embeddings())
+    pdfs = [make_pdf(requirement_pages(idx)) for idx in range(files)]
+    text_splitter = token_text_splitter()
+
+    def ingest(idx):
+        # One upload of all files, as the app ingests a multi-file upload
+        uploads = [(f"fsd_{file_idx}.pdf", data, {"file_hash": str(file_idx)}) for file_idx, data in enumerate(pdfs)]
+        for batch in iter_split_batches(iter_pdf_pages(uploads), text_splitter):
+            vectorstore.add_documents(batch)
+
+    bench.stage("ingest_pdfs", ingest, requests=1, concurrency=1)
+    _chat_stages(bench, vectorstore, workdir)
+
+
+class StubSpeechBackend:
+    # Stands in for a speech API: a fixed delay per segment and deterministic text
+    name = "stub"
+    local = False
+
+    def __init__(self, seconds_per_segment=0.02):
+        self.seconds_per_segment = seconds_per_segment
+
+    def transcribe(self, pcm, sample_rate):
+        time.sleep(self.seconds_per_segment)
+        rng = random.Random(len(pcm))
+        return " ".join(rng.choice(FEATURES) for _ in range(len(pcm) // (sample_rate * 2) * 2))
+
+
+def speech_pcm(seconds, sample_rate=16000, chunk_seconds=1.0):
+    # 16-bit mono PCM: 4 s tone bursts separated by 0.5 s of silence
+    tone = b"".join(
+        struct.pack("<h", int(8000 * math.sin(2 * math.pi * 220 * n / sample_rate))) for n in range(sample_rate)
+    )
+    silence = b"\x00\x00" * (sample_rate // 2)
+    audio = bytearray()
+    while len(audio) < seconds * sample_rate * 2:
+        audio += tone * 4 + silence
+    audio = bytes(audio[:seconds * sample_rate * 2])
+    step = int(chunk_seconds * sample_rate) * 2
+    return [audio[offset:offset + step] for offset in range(0, len(audio), step)]
+
+
+def video_gen(bench, workdir, audio_seconds=300):
+    from langchain_core.vectorstores import InMemoryVectorStore
+    from shared.ingestion import iter_pdf_pages, iter_split_batches
+    from shared.packing import token_text_splitter
+    from transcription import transcribe, transcript_documents
+
+    vectorstore = InMemoryVectorStore(_embeddings())
+    pcm = speech_pcm(audio_seconds)
+    backend = StubSpeechBackend()
+    segments = []
+
+    def transcribe_audio(idx):
+        segments[:] = transcribe(iter(pcm), backend)
+
+    def index_transcript(idx):
+        vectorstore.add_documents(transcript_documents(segments, f"video_{idx}.mp4"))
+
+    def ingest(idx):
+        text_splitter = token_text_splitter()
+        uploads = [(f"notes_{idx}.pdf", make_pdf(requirement_pages(idx, pages=4)), {})]
+        for batch in iter_split_batches(iter_pdf_pages(uploads), text_splitter):
+            vectorstore.add_documents(batch)
+
+    bench.stage("transcribe", transcribe_audio, requests=3, concurrency=1)
+    bench.stage("index_transcript", index_transcript, requests=3, concurrency=1)
+    bench.stage("ingest_pdfs", ingest, requests=2, concurrency=1)
+    _chat_stages(bench, vectorstore, workdir)
+
+
+def chatbot_qa(bench, workdir, batch_size=16):
+    from cache import ResponseCache
+    from qa import AUTO_MODEL, answer_batch, generate_response
+
+    api_key = os.environ["GROQ_API_KEY"]
+    cache = ResponseCache(embed=_embeddings().embed_query)
+
+    def answer(idx):
+        generate_response(f"{_question(idx)} (request {idx})", api_key, AUTO_MODEL)
+
+    def answer_cached(idx):
+        # The question set repeats, so most requests after the first round are cache hits
+        generate_response(_question(idx), api_key, AUTO_MODEL, cache=cache)
+
+    def batch(idx):
+        questions = [f"{_question(n)} (batch {idx}, item {n})" for n in range(batch_size)]
+        answer_batch(questions, api_key, AUTO_MODEL)
+
+    bench.stage("answer", answer)
+    bench.stage("answer_cached", answer_cached)
+    bench.stage("answer_batch", batch, requests=max(bench.requests // batch_size, 2), concurrency=1)
+    bench.note(cache.describe_stats())
+
+
+def _sql_database(path, schema, rows, setup=None):
+    from shared.database import GuardedSQLDatabase
+    from sqlalchemy import create_engine
+
+    if not os.path.exists(path):
+        connection = sqlite3.connect(path)
+        connection.executescript(schema)
+        for n in range(FILLER_TABLES):
+            connection.execute(f"CREATE TABLE archive_{n}(id INTEGER PRIMARY KEY, batch INT, note VARCHAR(50))")
+        for table, values in rows.items():
+            placeholders = ", ".join("?" * len(values[0]))
+            connection.executemany(f"INSERT INTO {table} VALUES ({placeholders})", values)
+        connection.commit()
+        connection.close()
+    engine = create_engine(f"sqlite:///{path}")
+    hidden_tables = ()
+    if setup:
+        # Runs before the schema is reflected, as the apps do, and returns
+        # the bookkeeping tables the agent is not shown
+        hidden_tables = setup(engine) or ()
+    return GuardedSQLDatabase(engine, hidden_tables=hidden_tables)
+
+
+def _agent_stages(bench, db, guidance_for=lambda question: ""):
+    # guidance_for gives the hints sent along with a question, as the
+    # Clinical Trial app does; the agent gets them appended to the question
+    from agent import create_agent
+    from shared.fast_sql import LLMCallCounter, fast_answer
+    from shared.plan_cache import PlanCache, answer_from_plan
+    from shared.schema_index import SchemaIndex
+
+    llm = _llm(SQL_MODEL_NAME, streaming=True)
+    agent = create_agent(llm, db, verbose=False)
+    index = SchemaIndex(_embeddings())
+    # LLM calls per question for each way of answering
+    counters = {"agent": LLMCallCounter(), "agent_pruned": LLMCallCounter(), "fast_sql": LLMCallCounter(),
+                "plan_cache": LLMCallCounter()}
+    plan_cache = PlanCache(":memory:")
+
+    def build_input(question):
+        guidance = guidance_for(question)
+        return f"{question}\n\n{guidance}" if guidance else question
+
+    def build(idx):
+        create_agent(llm, db, verbose=False)
+
+    def table_info(idx):
+        db.get_table_info()
+
+    def ask(idx):
+        agent.invoke({"input": build_input(_question(idx))}, {"callbacks": [counters["agent"]]})
+
+    def index_refresh(idx):
+        index.refresh(db)
+
+    def prune(idx):
+        index.relevant_tables(db, _question(idx))
+
+    def ask_pruned(idx):
+        question = _question(idx)
+        pruned = create_agent(llm, db, verbose=False, tables=index.relevant_tables(db, question))
+        pruned.invoke({"input": build_input(question)}, {"callbacks": [counters["agent_pruned"]]})
+
+    def ask_fast(idx):
+        question = _question(idx)
+        tables = index.relevant_tables(db, question)
+        fast_answer(llm, db.scoped(tables), question, callbacks=[counters["fast_sql"]], guidance=guidance_for(question))
+
+    def ask_planned(idx):
+        # The questions repeat, so after the first round every answer comes from a cached plan
+        question = _question(idx)
+        version = db.schema_version
+        if answer_from_plan(llm, db, plan_cache, "bench", version, question, callbacks=[counters["plan_cache"]]):
+            return
+        tables = index.relevant_tables(db, question)
+        answer, sql, result = fast_answer(llm, db.scoped(tables), question, callbacks=[counters["plan_cache"]],
+                                          guidance=guidance_for(question))
+        plan_cache.store("bench", version, question, sql, result, answer)
+
+    bench.stage("table_info", table_info)
+    bench.stage("agent_build", build, requests=min(bench.requests, 10), concurrency=1)
+    bench.stage("agent_answer", ask)
+    bench.stage("schema_index_build", index_refresh, requests=1, concurrency=1)
+    bench.stage("schema_index_prune", prune)
+    bench.stage("agent_answer_pruned", ask_pruned)
+    bench.stage("fast_sql_answer", ask_fast)
+    bench.stage("plan_cache_answer", ask_planned, concurrency=1)
+    tables = index.relevant_tables(db, _question(0))
+    bench.note(
+        f"schema in the prompt: {len(db.get_table_info()):,} chars for all {len(db.get_usable_table_names())} "
+        f"tables, {len(db.scoped(tables).get_table_info()):,} for the top {len(tables)}"
+    )
+    bench.note(plan_cache.describe_stats())
+    bench.note("LLM calls per question: " + ", ".join(
+        f"{mode} {counter.count / bench.requests:.1f}" for mode, counter in counters.items()
+    ))
+
+
+def mysql_chatbot(bench, workdir, students=5000):
+    rng = random.Random(0)
+    db = _sql_database(
+        os.path.join(workdir, "student.db"),
+        "CREATE TABLE STUDENT(NAME VARCHAR(25), CLASS VARCHAR(25), SECTION VARCHAR(25), MARKS INT);",
+        {"STUDENT": [
+            (f"Student {n}", rng.choice(["Data Science", "DEVOPS"]), rng.choice("ABC"), rng.randint(0, 100))
+            for n in range(students)
+        ]},
+    )
+    _agent_stages(bench, db)
+
+
+def clinical_trial(bench, workdir, participants=5000):
+    from agent import build_guidance
+    from aggregates import AggregateRefresher
+    from prompt_index import PROMPT_LIBRARY, PromptIndex
+    from sqlalchemy import text
+
+    rng = random.Random(0)
+    reasons = ["adverse event", "lost to follow-up", "withdrew consent"]
+
+    def participant(n):
+        dropped_out = int(rng.random() < 0.1)
+        return (n, rng.randrange(50), rng.randint(18, 90), rng.choice(["F", "M"]),
+                rng.choice(["treatment", "placebo"]), dropped_out, rng.choice(reasons) if dropped_out else None)
+
+    refreshers = []
+
+    def setup(engine):
+        refreshers.append(AggregateRefresher(engine))
+        refreshers[0].setup(create=True)
+        return refreshers[0].internal_table_names
+
+    db = _sql_database(
+        os.path.join(workdir, "clinical.db"),
+        """
+        CREATE TABLE trials(id INTEGER PRIMARY KEY, name VARCHAR(100), phase INT, treatment VARCHAR(100));
+        CREATE TABLE participants(id INTEGER PRIMARY KEY, trial_id INT, age INT, gender VARCHAR(10),
+                                  arm VARCHAR(20), dropped_out INT, dropout_reason VARCHAR(100));
+        CREATE TABLE adverse_events(id INTEGER PRIMARY KEY, participant_id INT, severity VARCHAR(20),
+                                    description VARCHAR(200));
+        CREATE TABLE quality_of_life(id INTEGER PRIMARY KEY, participant_id INT, score INT);
+        """,
+        {
+            "trials": [(n, f"Trial {n}", n % 4 + 1, f"Treatment {n % 7}") for n in range(50)],
+            "participants": [participant(n) for n in range(participants)],
+            "adverse_events": [
+                (n, rng.randrange(participants), rng.choice(["mild", "moderate", "severe"]), "Headache")
+                for n in range(participants // 5)
+            ],
+            "quality_of_life": [
+                (n, rng.randrange(participants), rng.randint(0, 100)) for n in range(participants * 2)
+            ],
+        },
+        setup=setup,
+    )
+    refresher = refreshers[0]
+    # New participants keep arriving between refreshes
+    next_id = itertools.count(participants)
+
+    def build_summaries(idx):
+        refresher.refresh()
+
+    def refresh_incremental(idx):
+        with db._engine.begin() as conn:
+            for n in (next(next_id) for _ in range(10)):
+                conn.execute(text(
+                    "INSERT INTO participants VALUES (:id, :trial, :age, :gender, :arm, :dropped, :reason)"
+                ), dict(zip(["id", "trial", "age", "gender", "arm", "dropped", "reason"], participant(n))))
+        refresher.refresh()
+
+    def dropouts_raw(idx):
+        db.run("SELECT trial_id, arm, SUM(dropped_out) * 1.0 / COUNT(*) FROM participants GROUP BY trial_id, arm")
+
+    def dropouts_summary(idx):
+        db.run("SELECT trial_id, arm, SUM(dropouts) * 1.0 / SUM(participants) FROM summary_dropouts "
+               "GROUP BY trial_id, arm")
+
+    bench.stage("aggregates_build", build_summaries, requests=1, concurrency=1)
+    bench.stage("aggregates_incremental", refresh_incremental, concurrency=1)
+    bench.stage("dropout_rate_raw", dropouts_raw)
+    bench.stage("dropout_rate_summary", dropouts_summary)
+    bench.note(refresher.describe_status())
+
+    # Fake embeddings carry no meaning, so the similarity floor is dropped and
+    # every question gets guidance, as a typical real question would
+    prompt_index = PromptIndex(_embeddings(), min_similarity=-1.0)
+    bench.note(
+        f"guidance per question: {len(build_guidance(QUESTIONS[0], prompt_index)):,} chars "
+        f"instead of {len(chr(10).join(PROMPT_LIBRARY)):,} for the whole library"
+    )
+    summaries = refresher.describe_for_agent()
+    _agent_stages(bench, db, lambda question: build_guidance(question, prompt_index, summaries))
+
+
+SCENARIOS = {
+    "chatbot_qa": ("ChatBot_QA-main/ChatBot_QA-main", chatbot_qa),
+    "fsd_rag": ("FSD-BRD-Conversational_RAG-main/FSD-BRD-Conversational_RAG-main", fsd_rag),
+    "video_gen": ("Video_Gen-main/Video_Gen-main", video_gen),
+    "mysql_chatbot": ("Mysql_ChatBot-main/Mysql_ChatBot-main", mysql_chatbot),
+    "clinical_trial": ("Clinical_Trial_AI_Assistant-main/Clinical_Trial_AI_Assistant-main/Clinical_2", clinical_trial),
+}
@@ -0,0 +1,204 @@
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# A local stand-in for the Groq (OpenAI-compatible) chat completions API.
+# Replies are derived from a hash of the prompt, so the same request always
+# gets the same answer; latency and token rate are configurable, so provider
+# time is a known constant and everything else measured is our own overhead.
+#
+# ChatGroq talks to it when GROQ_API_BASE points at the server:
+#   python benchmarks/stub_server.py --port 8765
+#   GROQ_API_BASE=http://127.0.0.1:8765 GROQ_API_KEY=stub streamlit run app.py
+DEFAULT_LATENCY = 0.05
+DEFAULT_TOKEN_RATE = 200.0
+DEFAULT_RESPONSE_TOKENS = 40
+
+WORDS = (
+    "the system shall validate each request and record the outcome in the audit log so that "
+    "users can review results quickly while the service keeps latency low for every query"
+).split()
+
+
+def _prompt_text(messages):
+    parts = []
+    for message in messages:
+        content = message.get("content") or ""
+        if isinstance(content, list):
+            content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+        parts.append(content)
+    return "\n".join(parts)
+
+
+def _words(prompt, count):
+    rng = random.Random(hashlib.sha256(prompt.encode("utf-8")).digest())
+    return " ".join(rng.choice(WORDS) for _ in range(count))
+
+
+# The steps a ReAct SQL agent takes before answering, in order; only the tools
+# named in the prompt are used, so an agent given the schema up front skips
+# straight to the query
+REACT_STEPS = [
+    ("sql_db_list_tables", "I should look at the tables in the database."),
+    ("sql_db_schema", "I should look at the schema of the relevant tables."),
+    ("sql_db_query", "I should run a query."),
+]
+
+
+def _react_reply(prompt, response_tokens):
+    tools = re.search(r"should be one of \[(.*?)\]", prompt)
+    offered = [name.strip() for name in tools.group(1).split(",")] if tools else []
+    scratchpad = prompt.split("Begin!")[-1]
+    observations = re.findall(r"Observation: (.*)", scratchpad)
+    steps = [(tool, thought) for tool, thought in REACT_STEPS if tool in offered]
+    if len(observations) < len(steps):
+        tool, thought = steps[len(observations)]
+        tool_input = {"sql_db_list_tables": "", "sql_db_query": "SELECT 1"}.get(
+            tool, observations[-1].split(",")[0].strip() if observations else ""
+        )
+        return f"Thought: {thought}\nAction: {tool}\nAction Input: {tool_input}"
+    return "Thought: I now know the final answer\nFinal Answer: " + _words(prompt, response_tokens)
+
+
+def _sql_reply(prompt):
+    # Single-pass SQL generation: count the rows of the first table in the schema
+    table = re.search(r"CREATE TABLE [`\"]?(\w+)", prompt)
+    return f"```sql\nSELECT COUNT(*) FROM {table.group(1) if table else 'dual'};\n```"
+
+
+def reply_for(messages, response_tokens):
+    prompt = _prompt_text(messages)
+    if "Action Input" in prompt and "Final Answer" in prompt:
+        return _react_reply(prompt, response_tokens)
+    if "Return only the SQL query" in prompt:
+        return _sql_reply(prompt)
+    return _words(prompt, response_tokens)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json(200, {"object": "list", "data": [{"id": "stub", "object": "model", "owned_by": "stub"}]})
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+        request = json.loads(body or b"{}")
+        config = self.server.config
+        with self.server.lock:
+            self.server.request_count += 1
+
+        max_tokens = request.get("max_tokens") or config["response_tokens"]
+        text = reply_for(request.get("messages", []), min(config["response_tokens"], max_tokens))
+        tokens = text.split(" ")
+        model = request.get("model", "stub")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        usage = {
+            "prompt_tokens": len(_prompt_text(request.get("messages", [])).split()),
+            "completion_tokens": len(tokens),
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+
+        time.sleep(config["latency"])
+        if not request.get("stream"):
+            time.sleep(len(tokens) / config["token_rate"])
+            self._send_json(200, {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": text},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            })
+            return
+
+        # Server-sent events, one token per chunk at the configured rate
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def event(delta, finish_reason=None, **extra):
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                **extra,
+            }
+            self._send_chunk(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+
+        event({"role": "assistant", "content": ""})
+        for idx, token in enumerate(tokens):
+            if idx:
+                time.sleep(1 / config["token_rate"])
+            event({"content": token if idx == 0 else " " + token})
+        event({}, "stop", x_groq={"usage": usage})
+        self._send_chunk(b"data: [DONE]\n\n")
+        self._send_chunk(b"")
+
+
+def start_server(host="127.0.0.1", port=0, latency=DEFAULT_LATENCY, token_rate=DEFAULT_TOKEN_RATE,
+                 response_tokens=DEFAULT_RESPONSE_TOKENS):
+    # Serves on a daemon thread; port 0 picks a free port. Returns (server, base_url).
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    server.config = {"latency": latency, "token_rate": token_rate, "response_tokens": response_tokens}
+    server.lock = threading.Lock()
+    server.request_count = 0
+    threading.Thread(target=server.serve_forever, name="stub-llm", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deterministic local stand-in for the Groq chat completions API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=DEFAULT_LATENCY, help="seconds before the first token")
+    parser.add_argument("--token-rate", type=float, default=DEFAULT_TOKEN_RATE, help="tokens per second")
+    parser.add_argument("--response-tokens", type=int, default=DEFAULT_RESPONSE_TOKENS)
+    args = parser.parse_args()
+
+    server, base_url = start_server(args.host, args.port, args.latency, args.token_rate, args.response_tokens)
+    print(f"Stub LLM listening on {base_url} (set GROQ_API_BASE={base_url})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
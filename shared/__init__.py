@@ -0,0 +1,3 @@
+# Modules shared by the apps in this repo: model routing, chat history, RAG
+# retrieval and packing, and the SQL database layer. Each app's entry point
+# puts the repo root on sys.path and imports them as shared.<module>.
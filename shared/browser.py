@@ -0,0 +1,159 @@
+import operator
+
+import pandas as pd
+import streamlit as st
+from sqlalchemy import and_, column, false, func, inspect, or_, select, table, text
+
+# Server-side table browsing: only the visible page is fetched, with keyset
+# pagination on (sort column, row key), the selected columns only, and sort
+# and filter done by the database. Every page is served by one pooled
+# connection; table lists, column lists and approximate row counts are cached.
+PAGE_SIZES = [25, 50, 100, 250]
+DEFAULT_VISIBLE_COLUMNS = 12
+SCHEMA_TTL_SECONDS = 600
+COUNT_TTL_SECONDS = 300
+NO_FILTER = "(no filter)"
+FILTER_OPERATORS = {
+    "contains": None,
+    "=": operator.eq,
+    "!=": operator.ne,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+}
+
+
+@st.cache_data(ttl=SCHEMA_TTL_SECONDS, show_spinner=False)
+def list_tables(_conn, db_key):
+    return inspect(_conn).get_table_names()
+
+
+@st.cache_data(ttl=SCHEMA_TTL_SECONDS, show_spinner=False)
+def table_schema(_conn, db_key, table_name):
+    # Column names, and the columns that identify a row (primary key, else the
+    # first unique index); the latter break ties between equal sort values
+    inspector = inspect(_conn)
+    columns = [col["name"] for col in inspector.get_columns(table_name)]
+    key = inspector.get_pk_constraint(table_name).get("constrained_columns") or []
+    if not key:
+        unique = [index["column_names"] for index in inspector.get_indexes(table_name) if index.get("unique")]
+        key = unique[0] if unique else []
+    return columns, key
+
+
+@st.cache_data(ttl=COUNT_TTL_SECONDS, show_spinner=False)
+def approximate_row_count(_conn, db_key, table_name):
+    # MySQL keeps an estimate in information_schema; COUNT(*) would scan the table
+    if _conn.dialect.name == "mysql":
+        row = _conn.execute(
+            text(
+                "SELECT TABLE_ROWS FROM information_schema.TABLES "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :name"
+            ),
+            {"name": table_name},
+        ).fetchone()
+        return row[0] if row else None
+    return _conn.execute(select(func.count()).select_from(table(table_name))).scalar()
+
+
+def _condition(col, op, value):
+    if op == "contains":
+        return col.contains(value, autoescape=True)
+    return FILTER_OPERATORS[op](col, value)
+
+
+def _after(cols, values, descending):
+    # Rows strictly after the cursor in ORDER BY order, written out column by
+    # column so the database can use an index. NULLs sort first ascending and
+    # last descending, as in MySQL.
+    if not cols:
+        return false()
+    col, value = cols[0], values[0]
+    if value is None:
+        beyond = false() if descending else col.is_not(None)
+        same = col.is_(None)
+    else:
+        beyond = or_(col < value, col.is_(None)) if descending else col > value
+        same = col == value
+    return or_(beyond, and_(same, _after(cols[1:], values[1:], descending)))
+
+
+def fetch_page(conn, table_name, all_columns, columns, order, descending, filters, cursor, page_size, keyset=True):
+    # With keyset paging, cursor is the order values of the last row of the
+    # previous page; otherwise it is a row offset. None is the first page.
+    # Returns the page as a DataFrame and the cursor of the next page, or None.
+    t = table(table_name, *[column(name) for name in all_columns])
+    selected = list(dict.fromkeys(columns + order))
+    query = select(*[t.c[name] for name in selected])
+    for name, op, value in filters:
+        query = query.where(_condition(t.c[name], op, value))
+    if cursor is not None:
+        if keyset:
+            query = query.where(_after([t.c[name] for name in order], cursor, descending))
+        else:
+            query = query.offset(cursor)
+    query = query.order_by(*[t.c[name].desc() if descending else t.c[name].asc() for name in order])
+    rows = conn.execute(query.limit(page_size + 1)).fetchall()
+
+    page = rows[:page_size]
+    next_cursor = None
+    if len(rows) > page_size:
+        if keyset:
+            next_cursor = tuple(page[-1][selected.index(name)] for name in order)
+        else:
+            next_cursor = (cursor or 0) + page_size
+    return pd.DataFrame(page, columns=selected)[columns], next_cursor
+
+
+def _next_page(state):
+    state["cursors"].append(state["next"])
+
+
+def _previous_page(state):
+    state["cursors"].pop()
+
+
+def show_table_browser(engine, label="Select a table to view"):
+    db_key = engine.url.render_as_string(hide_password=True)
+    with engine.connect() as conn:
+        selected_table = st.selectbox(label, list_tables(conn, db_key))
+        if not selected_table:
+            return
+        all_columns, key = table_schema(conn, db_key, selected_table)
+        count = approximate_row_count(conn, db_key, selected_table)
+        about = f" (about {count:,} rows)" if count is not None else ""
+        st.write(f"Showing data for table: {selected_table}{about}")
+
+        columns = st.multiselect(
+            "Columns", all_columns, default=all_columns[:DEFAULT_VISIBLE_COLUMNS], key=f"browser_columns_{selected_table}"
+        ) or all_columns
+        sort_col, order_col, size_col = st.columns(3)
+        sort_column = sort_col.selectbox(
+            "Sort by", all_columns, index=all_columns.index(key[0]) if key else 0, key=f"browser_sort_{selected_table}"
+        )
+        descending = order_col.checkbox("Descending", key="browser_descending")
+        page_size = size_col.selectbox("Rows per page", PAGE_SIZES, key="browser_page_size")
+        filter_col, op_col, value_col = st.columns(3)
+        filter_column = filter_col.selectbox("Filter on", [NO_FILTER] + all_columns, key=f"browser_filter_column_{selected_table}")
+        filter_op = op_col.selectbox("Operator", list(FILTER_OPERATORS), key="browser_filter_op")
+        filter_value = value_col.text_input("Value", key="browser_filter_value")
+        filters = [(filter_column, filter_op, filter_value)] if filter_column != NO_FILTER and filter_value else []
+
+        # Keyset pagination needs a unique order; without a row key pages fall back to offsets
+        order = [sort_column] + [name for name in key if name != sort_column] if key else [sort_column]
+        query_key = (db_key, selected_table, tuple(columns), sort_column, descending, page_size, tuple(filters))
+        state = st.session_state.get("table_browser")
+        if state is None or state["query"] != query_key:
+            state = st.session_state.table_browser = {"query": query_key, "cursors": [None], "next": None}
+
+        page, state["next"] = fetch_page(
+            conn, selected_table, all_columns, columns, order, descending, filters, state["cursors"][-1], page_size,
+            keyset=bool(key),
+        )
+
+    st.dataframe(page, hide_index=True)
+    prev_col, page_col, next_col = st.columns([1, 2, 1])
+    prev_col.button("Previous", on_click=_previous_page, args=(state,), disabled=len(state["cursors"]) == 1)
+    page_col.caption(f"Page {len(state['cursors'])}" + ("" if key else " (table has no key; paging by offset)"))
+    next_col.button("Next", on_click=_next_page, args=(state,), disabled=state["next"] is None)
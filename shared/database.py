@@ -0,0 +1,146 @@
+import copy
+import hashlib
+import os
+import threading
+import time
+
+from langchain_community.utilities import SQLDatabase
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.exc import SQLAlchemyError
+import streamlit as st
+
+from .guardrails import SQLGuard
+
+# Process-wide database access shared by all sessions: one tuned connection
+# pool per database, and one SQLDatabase whose table info (DDL plus sample
+# rows) is reflected once and reused until the schema fingerprint changes.
+# The engine is rebuilt every two hours (configure_db's ttl), and the
+# SQLDatabase with it.
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+POOL_RECYCLE_SECONDS = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))
+POOL_TIMEOUT_SECONDS = 30
+SCHEMA_CHECK_SECONDS = float(os.getenv("DB_SCHEMA_CHECK_SECONDS", "60"))
+
+
+@st.cache_resource(ttl="2h")
+def configure_db(mysql_host, mysql_port, mysql_user, mysql_password, mysql_db):
+    if not (mysql_host and mysql_user and mysql_password and mysql_db):
+        st.error("Please provide all MySQL connection details.")
+        st.stop()
+
+    try:
+        connection_string = f"mysql+mysqlconnector://{mysql_user}:{mysql_password}@{mysql_host}:{mysql_port}/{mysql_db}"
+        # Pre-ping replaces connections the server has dropped; recycling keeps
+        # them under MySQL's wait_timeout
+        engine = create_engine(
+            connection_string,
+            pool_size=POOL_SIZE,
+            max_overflow=MAX_OVERFLOW,
+            pool_recycle=POOL_RECYCLE_SECONDS,
+            pool_timeout=POOL_TIMEOUT_SECONDS,
+            pool_pre_ping=True,
+        )
+        with engine.connect() as conn:
+            result = conn.execute(text("SELECT 1"))
+            if result.fetchone() is None:
+                raise Exception("Failed to execute test query.")
+
+        return engine
+    except SQLAlchemyError as e:
+        st.error(f"SQLAlchemy Error: {str(e)}")
+        st.stop()
+    except Exception as e:
+        st.error(f"Error: {str(e)}")
+        st.stop()
+
+
+def schema_fingerprint(engine):
+    # One cheap metadata query; changes whenever a table or column is added,
+    # dropped or altered
+    with engine.connect() as conn:
+        if conn.dialect.name == "mysql":
+            rows = conn.execute(text(
+                "SELECT TABLE_NAME, COLUMN_NAME, COLUMN_TYPE, IS_NULLABLE, COLUMN_KEY "
+                "FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = DATABASE() "
+                "ORDER BY TABLE_NAME, ORDINAL_POSITION"
+            )).fetchall()
+        elif conn.dialect.name == "sqlite":
+            rows = conn.execute(text("SELECT type, name, sql FROM sqlite_master ORDER BY name")).fetchall()
+        else:
+            inspector = inspect(conn)
+            rows = [
+                (table_name, col["name"], str(col["type"]))
+                for table_name in inspector.get_table_names()
+                for col in inspector.get_columns(table_name)
+            ]
+    return hashlib.sha256(repr([tuple(row) for row in rows]).encode("utf-8")).hexdigest()
+
+
+class CachedSQLDatabase(SQLDatabase):
+    # Tables are reflected lazily, and each table's info is built once and
+    # cached. An instance stands for one version of the schema; when the
+    # fingerprint changes, get_sql_database builds a fresh one rather than
+    # resetting this one. Hidden tables (an app's own bookkeeping) are never
+    # listed or described.
+    _scope = None
+
+    def __init__(self, engine, hidden_tables=(), schema_version=None, **kwargs):
+        self._hidden_tables = set(hidden_tables)
+        kwargs.setdefault("lazy_table_reflection", True)
+        super().__init__(engine, **kwargs)
+        self._lock = threading.Lock()
+        self._table_info_cache = {}
+        self.schema_version = schema_version or schema_fingerprint(engine)
+
+    def scoped(self, table_names):
+        # A view showing only the given tables; it shares this instance's
+        # engine, reflected metadata and cached table info
+        view = copy.copy(self)
+        view._scope = set(table_names)
+        return view
+
+    def get_usable_table_names(self):
+        names = [name for name in super().get_usable_table_names() if name not in self._hidden_tables]
+        if self._scope is not None:
+            names = [name for name in names if name in self._scope]
+        return names
+
+    def get_table_info(self, table_names=None, get_col_comments=False):
+        table_names = list(self.get_usable_table_names()) if table_names is None else list(table_names)
+        with self._lock:
+            for table_name in table_names:
+                key = (table_name, get_col_comments)
+                if key not in self._table_info_cache:
+                    self._table_info_cache[key] = super().get_table_info([table_name], get_col_comments)
+            infos = [self._table_info_cache[(table_name, get_col_comments)] for table_name in table_names]
+        return "\n\n".join(sorted(info for info in infos if info))
+
+
+class GuardedSQLDatabase(SQLGuard, CachedSQLDatabase):
+    # What the SQL agents get: cached schema, and cost guardrails on every
+    # statement the LLM writes (see guardrails.py)
+    pass
+
+
+@st.cache_resource
+def _latest_database(db_key, hidden_tables):
+    # Holds the current GuardedSQLDatabase of one database for the whole process
+    return {"db": None, "checked_at": 0.0, "lock": threading.Lock()}
+
+
+def get_sql_database(engine, db_key, hidden_tables=()):
+    # One per database and schema version for the whole process, so reruns
+    # and sessions share the reflected schema instead of reflecting it again.
+    # The fingerprint is checked at most every SCHEMA_CHECK_SECONDS. After a
+    # change, or when configure_db has made a new engine, the next caller
+    # gets a freshly built instance; ones already handed out keep working.
+    latest = _latest_database(db_key, tuple(hidden_tables))
+    with latest["lock"]:
+        db, now = latest["db"], time.monotonic()
+        if db is None or db._engine is not engine or now - latest["checked_at"] >= SCHEMA_CHECK_SECONDS:
+            version = schema_fingerprint(engine)
+            if db is None or db._engine is not engine or version != db.schema_version:
+                latest["db"] = GuardedSQLDatabase(engine, hidden_tables=hidden_tables, schema_version=version)
+            latest["checked_at"] = now
+        return latest["db"]
@@ -0,0 +1,114 @@
+import re
+import threading
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+from sqlalchemy.exc import SQLAlchemyError
+
+from .guardrails import QueryRejected, validate_sql
+
+# Single-pass alternative to the ReAct SQL agent: one call writes the query
+# from the cached schema, the query is checked and run, one more call repairs
+# it only if it fails, and a last call phrases the answer. That is 2 LLM calls
+# per question, 3 with a repair, against 5-10 sequential agent steps. When the
+# repaired query fails too, FastSQLError is raised and the caller falls back
+# to the agent.
+TOP_K = 10
+MAX_RESULT_CHARS = 4000
+MAX_ERROR_CHARS = 500
+
+GENERATE_PROMPT = ChatPromptTemplate.from_messages([
+    ("system",
+     "You are a {dialect} expert. Given the schema below, write one syntactically correct {dialect} "
+     "SELECT query that answers the question. Unless the question asks for a specific number of rows, "
+     "return at most {top_k} rows. Only select the columns needed to answer, and only use tables and "
+     "columns that appear in the schema.\n\nSchema:\n{schema}{guidance}\n\n"
+     "Return only the SQL query, without explanation or formatting."),
+    ("human", "{question}"),
+])
+
+REPAIR_PROMPT = ChatPromptTemplate.from_messages([
+    ("system",
+     "You are a {dialect} expert. The query below failed. Fix it using the schema.\n\n"
+     "Schema:\n{schema}{guidance}\n\nQuery:\n{query}\n\nError:\n{error}\n\n"
+     "Return only the SQL query, without explanation or formatting."),
+    ("human", "{question}"),
+])
+
+ANSWER_PROMPT = ChatPromptTemplate.from_messages([
+    ("system",
+     "Answer the user's question from the result of the SQL query below. Be concise, and say so if "
+     "the result does not answer the question.\n\nQuery:\n{query}\n\nResult:\n{result}"),
+    ("human", "{question}"),
+])
+
+
+class FastSQLError(Exception):
+    pass
+
+
+class LLMCallCounter(BaseCallbackHandler):
+    # Counts LLM calls made under a run, whichever mode answered the question
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        with self._lock:
+            self.count += 1
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        with self._lock:
+            self.count += 1
+
+
+def extract_sql(text):
+    # Models often wrap the query in a code fence or add a line of prose
+    fenced = re.search(r"```(?:sql)?\s*(.*?)```", text, re.DOTALL | re.IGNORECASE)
+    if fenced:
+        text = fenced.group(1)
+    start = re.search(r"\b(SELECT|WITH)\b", text, re.IGNORECASE)
+    if start:
+        text = text[start.start():]
+    return text.strip().rstrip(";").strip()
+
+
+def execute_sql(db, sql):
+    # Returns (result, None), or (None, error) when the query is refused or fails
+    error = validate_sql(sql)
+    if error:
+        return None, error
+    try:
+        return str(db.run(sql)), None
+    except QueryRejected as e:
+        return None, str(e)
+    except SQLAlchemyError as e:
+        # The driver's message without the statement and background link
+        return None, str(e.orig if getattr(e, "orig", None) is not None else e)[:MAX_ERROR_CHARS]
+
+
+def phrase_answer(llm, question, sql, result, callbacks=None):
+    return (ANSWER_PROMPT | llm | StrOutputParser()).invoke(
+        {"question": question, "query": sql, "result": result[:MAX_RESULT_CHARS]}, {"callbacks": callbacks or []}
+    )
+
+
+def fast_answer(llm, db, question, top_k=TOP_K, callbacks=None, guidance=""):
+    # Returns (answer, sql, result). db's table info is cached (see
+    # database.py), so the schema costs nothing after the first question.
+    # guidance (hints on writing the query) goes next to the schema; the
+    # question alone is what gets answered
+    config = {"callbacks": callbacks or []}
+    inputs = {
+        "dialect": db.dialect, "schema": db.get_table_info(), "question": question, "top_k": top_k,
+        "guidance": f"\n\nGuidance for writing the query:\n{guidance}" if guidance else "",
+    }
+    sql = extract_sql((GENERATE_PROMPT | llm | StrOutputParser()).invoke(inputs, config))
+    result, error = execute_sql(db, sql)
+    if error:
+        sql = extract_sql((REPAIR_PROMPT | llm | StrOutputParser()).invoke({**inputs, "query": sql, "error": error}, config))
+        result, error = execute_sql(db, sql)
+        if error:
+            raise FastSQLError(error)
+    return phrase_answer(llm, question, sql, result, callbacks), sql, result
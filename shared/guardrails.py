@@ -0,0 +1,212 @@
+import json
+import os
+import re
+import threading
+
+from langchain_community.utilities.sql_database import truncate_word
+from sqlalchemy.exc import OperationalError
+
+# Cost guardrails for SQL written by the LLM, applied where the agent's tools
+# and fast SQL run statements. Each statement must be a single read-only
+# query. On MySQL its EXPLAIN estimate is checked first, and a statement
+# timeout is added. A row limit always caps what is fetched. A
+# per-database semaphore caps how many of these queries run at once. A
+# refused or stopped query raises QueryRejected, which the agent's query tool
+# reports back as "Error: ..." with a hint, so the agent can retry with a
+# cheaper query.
+MAX_QUERY_COST = float(os.getenv("DB_MAX_QUERY_COST", "1000000"))
+MAX_SCAN_ROWS = int(os.getenv("DB_MAX_SCAN_ROWS", "1000000"))
+MAX_RESULT_ROWS = int(os.getenv("DB_MAX_RESULT_ROWS", "100"))
+STATEMENT_TIMEOUT_SECONDS = float(os.getenv("DB_STATEMENT_TIMEOUT_SECONDS", "30"))
+MAX_CONCURRENT_QUERIES = int(os.getenv("DB_MAX_CONCURRENT_QUERIES", "4"))
+QUEUE_TIMEOUT_SECONDS = 30
+MYSQL_TIMEOUT_ERRNO = 3024  # ER_QUERY_TIMEOUT
+# A keyword followed by "(" is a function call, such as REPLACE(name, ' ', '')
+# or MySQL's INSERT(str, pos, len, newstr), not a statement
+WRITE_STATEMENTS = re.compile(
+    r"\b(INSERT|UPDATE|DELETE|REPLACE|MERGE|DROP|ALTER|CREATE|TRUNCATE|RENAME|GRANT|REVOKE|CALL|LOAD|LOCK)\b"
+    r"(?!\s*\()",
+    re.IGNORECASE,
+)
+# Reads that still write a file or variable, or take row locks
+SELECT_INTO = re.compile(r"\bINTO\b", re.IGNORECASE)
+LOCKING_READ = re.compile(r"\bFOR\s+(UPDATE|SHARE)\b|\bLOCK\s+IN\s+SHARE\s+MODE\b", re.IGNORECASE)
+
+
+class QueryRejected(Exception):
+    pass
+
+
+def validate_sql(sql):
+    # Returns why the query must not run, or None. Only a single read-only
+    # statement is allowed, as the agent is told too
+    if not sql:
+        return "No SQL query was returned."
+    code = re.sub(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\"", "''", sql)
+    if ";" in code:
+        return "Only one statement is allowed."
+    if not re.match(r"\s*(SELECT|WITH)\b", code, re.IGNORECASE):
+        return "Only SELECT queries are allowed."
+    if SELECT_INTO.search(code):
+        return "SELECT ... INTO is not allowed; return the rows instead."
+    if LOCKING_READ.search(code):
+        return "Locking reads (FOR UPDATE, FOR SHARE, LOCK IN SHARE MODE) are not allowed."
+    write = WRITE_STATEMENTS.search(code)
+    if write:
+        return f"{write.group(1).upper()} statements are not allowed."
+    return None
+
+
+def top_level(sql):
+    # sql with quoted text and everything inside parentheses blanked out, at
+    # the same positions, so keywords found in it are the statement's own
+    out, depth, quote, escaped = [], 0, None, False
+    for ch in sql:
+        if quote:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == quote:
+                quote = None
+            out.append(" ")
+        elif ch in "'\"`":
+            quote = ch
+            out.append(" ")
+        elif ch in "()":
+            depth = depth + 1 if ch == "(" else max(depth - 1, 0)
+            out.append(" ")
+        else:
+            out.append(ch if depth == 0 else " ")
+    return "".join(out)
+
+
+def query_cost(block):
+    # A UNION has no cost of its own; its parts are summed. A block with
+    # neither, such as SELECT 1, reads no table
+    if "cost_info" in block:
+        return float(block["cost_info"].get("query_cost", 0) or 0)
+    specs = block.get("union_result", {}).get("query_specifications", [])
+    return sum(query_cost(spec.get("query_block", {})) for spec in specs)
+
+
+def explain_estimates(plan):
+    # (query cost, [(table, rows) for each full table scan]) from MySQL's
+    # EXPLAIN FORMAT=JSON
+    cost = query_cost(plan.get("query_block", {}))
+    scans = []
+
+    def walk(node):
+        if isinstance(node, dict):
+            if node.get("access_type") == "ALL" and "table_name" in node:
+                scans.append((node["table_name"], int(node.get("rows_examined_per_scan", 0) or 0)))
+            for value in node.values():
+                walk(value)
+        elif isinstance(node, list):
+            for value in node:
+                walk(value)
+
+    walk(plan)
+    return cost, scans
+
+
+_semaphores = {}
+_semaphores_lock = threading.Lock()
+
+
+def semaphore_for(engine):
+    # Shared by every SQLDatabase on the same database in the process
+    key = engine.url.render_as_string(hide_password=True)
+    with _semaphores_lock:
+        if key not in _semaphores:
+            _semaphores[key] = threading.BoundedSemaphore(MAX_CONCURRENT_QUERIES)
+        return _semaphores[key]
+
+
+class SQLGuard:
+    # Mixed into an SQLDatabase (see database.py). Only text statements are
+    # guarded; SQLAlchemy constructs come from our own code
+    def check_cost(self, sql):
+        if self.dialect != "mysql":
+            # Other databases give no usable estimate; limits and the semaphore still apply
+            return
+        rows = self._execute(f"EXPLAIN FORMAT=JSON {sql}")
+        cost, scans = explain_estimates(json.loads(next(iter(rows[0].values()))))
+        if cost > MAX_QUERY_COST:
+            raise QueryRejected(
+                f"The query's estimated cost ({cost:,.0f}) is over the limit of {MAX_QUERY_COST:,.0f}. "
+                "Add selective WHERE conditions, join on indexed keys instead of cross joining, "
+                "or aggregate in a smaller query."
+            )
+        for table, scanned in scans:
+            if scanned > MAX_SCAN_ROWS:
+                raise QueryRejected(
+                    f"The query scans all of {table} (about {scanned:,} rows), over the limit of "
+                    f"{MAX_SCAN_ROWS:,}. Filter {table} on an indexed column."
+                )
+
+    def guard_sql(self, sql):
+        sql = sql.strip().rstrip(";").strip()
+        error = validate_sql(sql)
+        if error:
+            raise QueryRejected(error)
+        self.check_cost(sql)
+        # One extra row tells whether the result was cut off. A LIMIT of the
+        # query's own may be larger, so such a query is wrapped instead;
+        # others get the LIMIT directly, as a derived table would reject
+        # duplicate column names and may drop an ORDER BY
+        if re.search(r"\bLIMIT\b", top_level(sql), re.IGNORECASE):
+            sql = f"SELECT * FROM (\n{sql}\n) AS q LIMIT {MAX_RESULT_ROWS + 1}"
+        else:
+            sql = f"{sql}\nLIMIT {MAX_RESULT_ROWS + 1}"
+        if self.dialect == "mysql":
+            select = re.search(r"\bSELECT\b", top_level(sql), re.IGNORECASE)
+            if select:
+                hint = f" /*+ MAX_EXECUTION_TIME({int(STATEMENT_TIMEOUT_SECONDS * 1000)}) */"
+                sql = sql[:select.end()] + hint + sql[select.end():]
+        return sql
+
+    def run(self, command, fetch="all", include_columns=False, *, parameters=None, execution_options=None):
+        if not isinstance(command, str) or fetch == "cursor":
+            return super().run(command, fetch, include_columns, parameters=parameters,
+                               execution_options=execution_options)
+        semaphore = semaphore_for(self._engine)
+        if not semaphore.acquire(timeout=QUEUE_TIMEOUT_SECONDS):
+            raise QueryRejected("The database is busy with other queries. Try again shortly.")
+        try:
+            sql = self.guard_sql(command)
+            rows = self._execute(sql, fetch, parameters=parameters, execution_options=execution_options)
+        except OperationalError as e:
+            if getattr(e.orig, "errno", None) == MYSQL_TIMEOUT_ERRNO:
+                raise QueryRejected(
+                    f"The query was stopped after {STATEMENT_TIMEOUT_SECONDS:g} seconds. "
+                    "Make it cheaper with selective filters or fewer joins."
+                ) from e
+            raise
+        finally:
+            semaphore.release()
+
+        # Formatted as SQLDatabase.run does, plus a note when rows were cut
+        # off, whether by the added limit or a larger LIMIT of the query's own
+        truncated = len(rows) > MAX_RESULT_ROWS
+        rows = [
+            {column: truncate_word(value, length=self._max_string_length) for column, value in row.items()}
+            for row in rows[:MAX_RESULT_ROWS]
+        ]
+        if not include_columns:
+            rows = [tuple(row.values()) for row in rows]
+        result = str(rows) if rows else ""
+        if truncated:
+            result += (
+                f"\n(Only the first {MAX_RESULT_ROWS} rows are shown. Aggregate or filter further "
+                "to see the rest.)"
+            )
+        return result
+
+    def run_no_throw(self, command, fetch="all", include_columns=False, *, parameters=None,
+                     execution_options=None):
+        try:
+            return super().run_no_throw(command, fetch, include_columns, parameters=parameters,
+                                        execution_options=execution_options)
+        except QueryRejected as e:
+            return f"Error: {e}"
@@ -0,0 +1,373 @@
+import atexit
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import SystemMessage, message_to_dict, messages_from_dict
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+
+from .tokens import count_tokens
+
+# Chat history that keeps the prompt-side view within a token budget: the most
+# recent turns are sent verbatim and older turns are folded into a running
+# summary that is updated in the background. The summary is stored with the
+# session, so a resumed session picks up where it left off; until a summary
+# covers them, older turns stay in the prompt verbatim.
+DEFAULT_TOKEN_BUDGET = 1024
+SUMMARY_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="history-summary")
+
+summary_prompt = ChatPromptTemplate.from_messages([
+    ("system",
+     "Progressively summarize the conversation between a user and an assistant. "
+     "Extend the existing summary with the new lines and return only the new summary, "
+     "in at most {max_words} words. Keep names, numbers and open questions."),
+    ("human", "Existing summary:\n{summary}\n\nNew lines:\n{new_lines}"),
+])
+
+
+def create_summarize_chain(llm):
+    return summary_prompt | llm | StrOutputParser()
+
+
+class CompactingChatHistory(BaseChatMessageHistory):
+    def __init__(self, backend, token_budget=DEFAULT_TOKEN_BUDGET, summarize_chain=None):
+        self.backend = backend
+        self.token_budget = token_budget
+        self.summarize_chain = summarize_chain
+        self.summary, self.summarized_count = (
+            backend.load_summary() if hasattr(backend, "load_summary") else ("", 0)
+        )
+        self._pending = None
+        # Bumped by clear(), so a summary still being written is dropped
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def configure(self, summarize_chain, token_budget):
+        self.summarize_chain = summarize_chain
+        self.token_budget = token_budget
+
+    @property
+    def messages(self):
+        messages = self.backend.messages
+        with self._lock:
+            summary, summarized_count = self.summary, self.summarized_count
+        used = count_tokens(summary)
+        window_start = len(messages)
+        for idx in range(len(messages) - 1, -1, -1):
+            used += count_tokens(messages[idx].content)
+            if used > self.token_budget:
+                break
+            window_start = idx
+        # Start the window on a user turn so question/answer pairs stay together
+        while window_start < len(messages) and messages[window_start].type != "human":
+            window_start += 1
+
+        self._schedule_summary(messages, window_start)
+        prefix = [SystemMessage(content=f"Summary of the earlier conversation: {summary}")] if summary else []
+        # Turns the summary does not cover yet are kept, even past the budget
+        return prefix + messages[min(window_start, summarized_count):]
+
+    def add_messages(self, messages):
+        self.backend.add_messages(messages)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            if self._pending is not None:
+                self._pending.cancel()
+                self._pending = None
+            self.summary = ""
+            self.summarized_count = 0
+            self.backend.clear()
+
+    def _schedule_summary(self, messages, window_start):
+        with self._lock:
+            if self.summarize_chain is None or window_start <= self.summarized_count:
+                return
+            if self._pending is not None and not self._pending.done():
+                return
+            # At most a budget's worth of turns per call, so a long backlog is
+            # folded in over several calls; each stops on a user turn, as the
+            # window does
+            end, used = self.summarized_count, 0
+            while end < window_start:
+                used += count_tokens(messages[end].content)
+                if used > self.token_budget and end > self.summarized_count:
+                    break
+                end += 1
+            while end < window_start and messages[end].type != "human":
+                end += 1
+            new_lines = "\n".join(
+                f"{message.type}: {message.content}" for message in messages[self.summarized_count:end]
+            )
+            self._pending = SUMMARY_EXECUTOR.submit(
+                self._summarize, self.summarize_chain, self.summary, new_lines, end, self._generation
+            )
+
+    def _summarize(self, summarize_chain, summary, new_lines, summarized_count, generation):
+        # The summary gets at most a quarter of the budget
+        max_words = max(self.token_budget // 4, 32)
+        new_summary = summarize_chain.invoke(
+            {"summary": summary or "(none)", "new_lines": new_lines, "max_words": max_words}
+        )
+        with self._lock:
+            if generation != self._generation:
+                # The history was cleared meanwhile
+                return
+            self.summary = new_summary
+            self.summarized_count = summarized_count
+            if hasattr(self.backend, "save_summary"):
+                self.backend.save_summary(new_summary, summarized_count)
+
+
+# Persistent history stores shared by all Streamlit workers. Sessions that have
+# not been used for ttl_seconds, or that fall outside the max_sessions most
+# recently used, are evicted.
+HISTORY_BACKEND = os.getenv("CHAT_HISTORY_BACKEND", "sqlite")
+HISTORY_PATH = os.getenv("CHAT_HISTORY_PATH", "./chat_history")
+HISTORY_TTL_SECONDS = float(os.getenv("CHAT_HISTORY_TTL_HOURS", "72")) * 3600
+HISTORY_MAX_SESSIONS = int(os.getenv("CHAT_HISTORY_MAX_SESSIONS", "10000"))
+EVICT_EVERY = 100
+
+
+class StoredChatHistory(BaseChatMessageHistory):
+    def __init__(self, store, session_id):
+        self.store = store
+        self.session_id = session_id
+
+    @property
+    def messages(self):
+        return self.store.load(self.session_id)
+
+    def add_messages(self, messages):
+        self.store.append(self.session_id, messages)
+
+    def clear(self):
+        self.store.clear(self.session_id)
+
+    def load_summary(self):
+        # (summary, number of messages it covers)
+        return self.store.load_summary(self.session_id)
+
+    def save_summary(self, summary, summarized_count):
+        self.store.save_summary(self.session_id, summary, summarized_count)
+
+
+def _dump(message):
+    return json.dumps(message_to_dict(message))
+
+
+class SQLiteHistoryStore:
+    def __init__(self, path, ttl_seconds=HISTORY_TTL_SECONDS, max_sessions=HISTORY_MAX_SESSIONS,
+                 batch_size=64, flush_interval=0.2):
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS messages (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT NOT NULL,
+                message TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS messages_session ON messages (session_id, seq);
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS sessions_last_access ON sessions (last_access);
+            CREATE TABLE IF NOT EXISTS summaries (
+                session_id TEXT PRIMARY KEY,
+                summary TEXT NOT NULL,
+                summarized_count INTEGER NOT NULL
+            );
+            """
+        )
+        self._lock = threading.Lock()
+        self._pending = []
+        self._touched = set()
+        self._flushes = 0
+        self._wake = threading.Event()
+        threading.Thread(target=self._writer, name="history-writer", daemon=True).start()
+        atexit.register(self.flush)
+
+    def load(self, session_id):
+        self.flush()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT message FROM messages WHERE session_id = ? ORDER BY seq", (session_id,)
+            ).fetchall()
+            # Reads count as use for LRU eviction; the timestamp is written with the next batch
+            self._touched.add(session_id)
+        self._wake.set()
+        return messages_from_dict([json.loads(row[0]) for row in rows])
+
+    def append(self, session_id, messages):
+        with self._lock:
+            self._pending.extend((session_id, _dump(message)) for message in messages)
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self.flush()
+        else:
+            self._wake.set()
+
+    def clear(self, session_id):
+        self.flush()
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            self._conn.execute("DELETE FROM summaries WHERE session_id = ?", (session_id,))
+
+    def load_summary(self, session_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT summary, summarized_count FROM summaries WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return tuple(row) if row else ("", 0)
+
+    def save_summary(self, session_id, summary, summarized_count):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO summaries (session_id, summary, summarized_count) VALUES (?, ?, ?) "
+                "ON CONFLICT (session_id) DO UPDATE SET summary = excluded.summary, "
+                "summarized_count = excluded.summarized_count",
+                (session_id, summary, summarized_count),
+            )
+
+    def flush(self):
+        with self._lock:
+            if not self._pending and not self._touched:
+                return
+            pending, self._pending = self._pending, []
+            touched = self._touched | {session_id for session_id, _ in pending}
+            self._touched = set()
+            now = time.time()
+            with self._conn:
+                self._conn.executemany("INSERT INTO messages (session_id, message) VALUES (?, ?)", pending)
+                self._conn.executemany(
+                    "INSERT INTO sessions (session_id, last_access) VALUES (?, ?) "
+                    "ON CONFLICT (session_id) DO UPDATE SET last_access = excluded.last_access",
+                    [(session_id, now) for session_id in touched],
+                )
+            self._flushes += 1
+            if self._flushes % EVICT_EVERY == 0:
+                self._evict(now)
+
+    def _evict(self, now):
+        with self._conn:
+            expired = self._conn.execute(
+                "SELECT session_id FROM sessions WHERE last_access < ?", (now - self.ttl_seconds,)
+            ).fetchall()
+            expired += self._conn.execute(
+                "SELECT session_id FROM sessions ORDER BY last_access DESC LIMIT -1 OFFSET ?",
+                (self.max_sessions,),
+            ).fetchall()
+            self._conn.executemany("DELETE FROM messages WHERE session_id = ?", expired)
+            self._conn.executemany("DELETE FROM sessions WHERE session_id = ?", expired)
+            self._conn.executemany("DELETE FROM summaries WHERE session_id = ?", expired)
+
+    def _writer(self):
+        while True:
+            self._wake.wait()
+            time.sleep(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+
+class FileHistoryStore:
+    # One JSON-lines file per session, plus a JSON file for its summary; the
+    # messages file's mtime is its last access time
+    def __init__(self, directory, ttl_seconds=HISTORY_TTL_SECONDS, max_sessions=HISTORY_MAX_SESSIONS):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self._appends = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, session_id, suffix=".jsonl"):
+        name = hashlib.sha256(session_id.encode()).hexdigest()
+        return os.path.join(self.directory, f"{name}{suffix}")
+
+    def load(self, session_id):
+        path = self._path(session_id)
+        try:
+            with open(path, encoding="utf-8") as file:
+                messages = messages_from_dict([json.loads(line) for line in file if line.strip()])
+            # Reads count as use for LRU eviction, as in SQLiteHistoryStore
+            os.utime(path)
+        except FileNotFoundError:
+            return []
+        return messages
+
+    def append(self, session_id, messages):
+        # All messages of a turn go out in a single write
+        lines = "".join(_dump(message) + "\n" for message in messages)
+        with open(self._path(session_id), "a", encoding="utf-8") as file:
+            file.write(lines)
+        with self._lock:
+            self._appends += 1
+            evict = self._appends % EVICT_EVERY == 0
+        if evict:
+            self._evict()
+
+    def clear(self, session_id):
+        for path in (self._path(session_id), self._path(session_id, ".summary.json")):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def load_summary(self, session_id):
+        try:
+            with open(self._path(session_id, ".summary.json"), encoding="utf-8") as file:
+                stored = json.load(file)
+        except FileNotFoundError:
+            return "", 0
+        return stored["summary"], stored["summarized_count"]
+
+    def save_summary(self, session_id, summary, summarized_count):
+        # Written to a temporary file and renamed, so a reader never sees half of it
+        path = self._path(session_id, ".summary.json")
+        with open(f"{path}.tmp", "w", encoding="utf-8") as file:
+            json.dump({"summary": summary, "summarized_count": summarized_count}, file)
+        os.replace(f"{path}.tmp", path)
+
+    def flush(self):
+        pass
+
+    def _evict(self):
+        now = time.time()
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".jsonl"):
+                entries.append((entry.stat().st_mtime, entry.path))
+        entries.sort(reverse=True)
+        for rank, (mtime, path) in enumerate(entries):
+            if rank >= self.max_sessions or mtime < now - self.ttl_seconds:
+                for stale in (path, path[:-len(".jsonl")] + ".summary.json"):
+                    try:
+                        os.remove(stale)
+                    except FileNotFoundError:
+                        pass
+
+
+def open_history_store(backend=HISTORY_BACKEND, path=HISTORY_PATH):
+    if backend == "file":
+        return FileHistoryStore(path)
+    if backend == "sqlite":
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        return SQLiteHistoryStore(path if path.endswith(".db") else f"{path}.db")
+    raise ValueError(f"Unknown chat history backend: {backend}")
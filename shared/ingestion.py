@@ -0,0 +1,61 @@
+import io
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from langchain_core.documents import Document
+from pypdf import PdfReader
+
+# Shared PDF ingestion stage: uploads are parsed from memory in a process pool
+# and their pages are streamed into the splitter in bounded batches.
+MAX_WORKERS = min(os.cpu_count() or 1, 8)
+SPLIT_BATCH_SIZE = 64
+
+
+def _parse_pdf(data):
+    reader = PdfReader(io.BytesIO(data))
+    return [page.extract_text() or "" for page in reader.pages]
+
+
+def _page_documents(source, pages, metadata):
+    for page_number, text in enumerate(pages):
+        yield Document(page_content=text, metadata={**metadata, "source": source, "page": page_number})
+
+
+def iter_pdf_pages(files, max_workers=MAX_WORKERS):
+    # files is a list of (source, bytes, metadata) tuples; pages are yielded in
+    # upload order while at most 2 * max_workers files are held in memory
+    if len(files) <= 1 or max_workers <= 1:
+        for source, data, metadata in files:
+            yield from _page_documents(source, _parse_pdf(data), metadata)
+        return
+
+    # Spawned, not forked: forking Streamlit's threaded server can copy a lock
+    # some other thread holds, and the worker then hangs on it
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        pending = deque()
+        remaining = iter(files)
+        for source, data, metadata in remaining:
+            pending.append((source, metadata, executor.submit(_parse_pdf, data)))
+            if len(pending) >= 2 * max_workers:
+                break
+        while pending:
+            source, metadata, future = pending.popleft()
+            for source_next, data, metadata_next in remaining:
+                pending.append((source_next, metadata_next, executor.submit(_parse_pdf, data)))
+                break
+            yield from _page_documents(source, future.result(), metadata)
+
+
+def iter_split_batches(pages, text_splitter, batch_size=SPLIT_BATCH_SIZE):
+    # Splits page by page and yields lists of at most batch_size chunks, ready
+    # to be embedded with vectorstore.add_documents
+    batch = []
+    for page in pages:
+        batch.extend(text_splitter.split_documents([page]))
+        while len(batch) >= batch_size:
+            yield batch[:batch_size]
+            batch = batch[batch_size:]
+    if batch:
+        yield batch
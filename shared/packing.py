@@ -0,0 +1,81 @@
+from langchain_core.runnables import RunnableLambda
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from .tokens import count_tokens
+
+# Token-aware chunking and packing of retrieved chunks into the {context} slot
+# of the stuff chain. The splitter settings (in tokens) are also part of the
+# FSD app's index key, so changing them re-indexes.
+CHUNK_TOKENS = 400
+CHUNK_OVERLAP_TOKENS = 40
+RETRIEVAL_K = 12
+DEFAULT_CONTEXT_BUDGET = 1500
+NEAR_DUPLICATE_THRESHOLD = 0.8
+SHINGLE_SIZE = 5
+
+
+def token_text_splitter(chunk_tokens=CHUNK_TOKENS, chunk_overlap_tokens=CHUNK_OVERLAP_TOKENS):
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_tokens, chunk_overlap=chunk_overlap_tokens, length_function=count_tokens
+    )
+
+
+def _shingles(text):
+    words = text.lower().split()
+    if len(words) <= SHINGLE_SIZE:
+        return {tuple(words)}
+    return {tuple(words[idx:idx + SHINGLE_SIZE]) for idx in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def _overlap(shingles, other):
+    # Share of the smaller chunk covered by the other one, so a chunk that is
+    # mostly the overlap region of its neighbour counts as a duplicate
+    if not shingles or not other:
+        return 0.0
+    return len(shingles & other) / min(len(shingles), len(other))
+
+
+class ContextPacker:
+    def __init__(self, token_budget=DEFAULT_CONTEXT_BUDGET, duplicate_threshold=NEAR_DUPLICATE_THRESHOLD):
+        self.token_budget = token_budget
+        self.duplicate_threshold = duplicate_threshold
+        self.last_stats = {}
+
+    def pack(self, docs):
+        # docs arrive ordered by relevance; keep that order, skip near-duplicates
+        # of chunks already packed and anything that no longer fits the budget
+        packed, kept_shingles = [], []
+        used = duplicates = over_budget = 0
+        for doc in docs:
+            shingles = _shingles(doc.page_content)
+            if any(_overlap(shingles, kept) >= self.duplicate_threshold for kept in kept_shingles):
+                duplicates += 1
+                continue
+            tokens = count_tokens(doc.page_content)
+            if used + tokens > self.token_budget:
+                over_budget += 1
+                continue
+            packed.append(doc)
+            kept_shingles.append(shingles)
+            used += tokens
+        self.last_stats = {
+            "retrieved": len(docs),
+            "packed": len(packed),
+            "duplicates": duplicates,
+            "over_budget": over_budget,
+            "context_tokens": used,
+        }
+        return packed
+
+    def as_runnable(self):
+        return RunnableLambda(self.pack).with_config(run_name="pack_context")
+
+    def describe_stats(self):
+        stats = self.last_stats
+        if not stats:
+            return ""
+        return (
+            f"Context: {stats['packed']} of {stats['retrieved']} retrieved chunks, "
+            f"{stats['context_tokens']}/{self.token_budget} tokens "
+            f"({stats['duplicates']} near-duplicates dropped, {stats['over_budget']} over budget)"
+        )
@@ -0,0 +1,157 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from .fast_sql import execute_sql, phrase_answer
+from .guardrails import validate_sql
+
+# Persistent cache from a question to the SQL that answered it, so repeated
+# questions skip writing the query. Keys are the database, its schema version
+# and the normalized question; after a schema change older plans are never
+# matched again and are deleted on the next store. A hit runs the stored SQL
+# directly, and when the result is unchanged the stored answer is reused
+# without any LLM call. The new result and answer are written back, so a
+# changed result is phrased once. With PLAN_CACHE_RESULT_TTL set, results
+# younger than that many seconds are served without running the query
+# either. A plan whose SQL no longer runs is dropped and counts as a miss.
+PLAN_CACHE_PATH = os.getenv("PLAN_CACHE_PATH", "plan_cache.db")
+RESULT_TTL_SECONDS = float(os.getenv("PLAN_CACHE_RESULT_TTL", "0"))  # 0 disables result caching
+MAX_PLANS = 5000
+QUERY_TOOL = "sql_db_query"
+
+
+def normalize_question(question):
+    question = re.sub(r"\s+", " ", question.strip().lower())
+    return question.rstrip("?!. ")
+
+
+class PlanCache:
+    def __init__(self, path=PLAN_CACHE_PATH, result_ttl_seconds=RESULT_TTL_SECONDS, max_plans=MAX_PLANS):
+        self.result_ttl_seconds = result_ttl_seconds
+        self.max_plans = max_plans
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS plans (
+                db_key TEXT NOT NULL,
+                schema_version TEXT NOT NULL,
+                question TEXT NOT NULL,
+                sql TEXT NOT NULL,
+                result TEXT,
+                answer TEXT,
+                result_at REAL NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (db_key, schema_version, question)
+            );
+            CREATE INDEX IF NOT EXISTS plans_last_used ON plans (last_used);
+            """
+        )
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def lookup(self, db_key, schema_version, question):
+        # Returns the plan as a dict, or None; "fresh" says whether its result
+        # is within the result TTL
+        key = (db_key, schema_version, normalize_question(question))
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT sql, result, answer, result_at FROM plans "
+                "WHERE db_key = ? AND schema_version = ? AND question = ?", key
+            ).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["hits"] += 1
+            self._conn.execute(
+                "UPDATE plans SET last_used = ? WHERE db_key = ? AND schema_version = ? AND question = ?",
+                (now, *key),
+            )
+        sql, result, answer, result_at = row
+        fresh = result is not None and now - result_at <= self.result_ttl_seconds
+        return {"sql": sql, "result": result, "answer": answer, "fresh": fresh}
+
+    def store(self, db_key, schema_version, question, sql, result=None, answer=None):
+        # Only single read-only queries are kept (see guardrails.py)
+        if validate_sql(sql):
+            return
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO plans (db_key, schema_version, question, sql, result, answer, result_at, "
+                "last_used) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (db_key, schema_version, normalize_question(question), sql, result, answer, now, now),
+            )
+            self._conn.execute(
+                "DELETE FROM plans WHERE db_key = ? AND schema_version != ?", (db_key, schema_version)
+            )
+            self._conn.execute(
+                "DELETE FROM plans WHERE rowid IN "
+                "(SELECT rowid FROM plans ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_plans,),
+            )
+
+    def invalidate(self, db_key, schema_version, question):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM plans WHERE db_key = ? AND schema_version = ? AND question = ?",
+                (db_key, schema_version, normalize_question(question)),
+            )
+            # The lookup found it, but it could not answer
+            self.stats["hits"] -= 1
+            self.stats["misses"] += 1
+
+    def describe_stats(self):
+        total = self.stats["hits"] + self.stats["misses"]
+        rate = self.stats["hits"] / total if total else 0.0
+        return f"Plan cache hit rate {rate:.0%} ({self.stats['hits']} hits, {self.stats['misses']} misses)"
+
+
+def answer_from_plan(llm, db, plan_cache, db_key, schema_version, question, callbacks=None):
+    # Returns (answer, sql, result), or None when there is no usable plan
+    plan = plan_cache.lookup(db_key, schema_version, question)
+    if plan is None:
+        return None
+    sql = plan["sql"]
+    if plan["fresh"] and plan["answer"]:
+        return plan["answer"], sql, plan["result"]
+    result, error = execute_sql(db, sql)
+    if error:
+        plan_cache.invalidate(db_key, schema_version, question)
+        return None
+    if result == plan["result"] and plan["answer"]:
+        answer = plan["answer"]
+    else:
+        answer = phrase_answer(llm, question, sql, result, callbacks)
+    plan_cache.store(db_key, schema_version, question, sql, result, answer)
+    return answer, sql, result
+
+
+class SQLCapture(BaseCallbackHandler):
+    # Records the last query the SQL agent ran successfully, and its result,
+    # so the agent's answers can be cached as plans too
+    def __init__(self):
+        self.sql = None
+        self.result = None
+        self._pending = {}
+
+    def on_tool_start(self, serialized, input_str, run_id=None, **kwargs):
+        if (serialized or {}).get("name") == QUERY_TOOL:
+            self._pending[run_id] = input_str
+
+    def on_tool_end(self, output, run_id=None, **kwargs):
+        sql = self._pending.pop(run_id, None)
+        output = str(getattr(output, "content", output))
+        # The query tool reports failures as its output rather than raising
+        if sql is not None and not output.startswith("Error:"):
+            self.sql = sql.strip().rstrip(";").strip()
+            self.result = output
+
+    def on_tool_error(self, error, run_id=None, **kwargs):
+        self._pending.pop(run_id, None)
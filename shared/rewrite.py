@@ -0,0 +1,98 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import RunnableLambda
+
+# Drop-in replacement for create_history_aware_retriever that only calls the
+# LLM to rewrite a question when the rewrite can change the retrieval.
+
+# Words that usually refer back to earlier turns; a question without any of
+# them is treated as already standalone, unless it is elliptical: very short,
+# or opening like a follow-up ("What about step 3?", "And the second one?")
+REFERENCE_PATTERN = re.compile(
+    r"\b(it|its|they|them|their|theirs|this|that|these|those|he|him|his|she|her|hers|"
+    r"above|previous|earlier|former|latter|same|again|also|else|more|other|another)\b",
+    re.IGNORECASE,
+)
+FOLLOW_UP_PATTERN = re.compile(r"^\W*(what about|how about|what if|and|or|but|then|so)\b", re.IGNORECASE)
+MAX_ELLIPTICAL_WORDS = 4
+
+
+class RewriteCache:
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"llm_calls": 0, "no_history": 0, "standalone": 0, "cache_hits": 0}
+
+    @property
+    def saved_calls(self):
+        return self.stats["no_history"] + self.stats["standalone"] + self.stats["cache_hits"]
+
+    def count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.stats["cache_hits"] += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+def history_digest(messages):
+    digest = hashlib.sha256()
+    for message in messages:
+        digest.update(f"{message.type}:{message.content}\n".encode())
+    return digest.hexdigest()
+
+
+def is_standalone(question):
+    if len(question.split()) <= MAX_ELLIPTICAL_WORDS or FOLLOW_UP_PATTERN.match(question):
+        return False
+    return REFERENCE_PATTERN.search(question) is None
+
+
+def create_fast_history_aware_retriever(llm, retriever, prompt, cache):
+    rewrite_chain = prompt | llm | StrOutputParser()
+
+    def rewrite(inputs):
+        question = inputs["input"]
+        history = inputs.get("chat_history") or []
+        if not history:
+            cache.count("no_history")
+            return question
+        if is_standalone(question):
+            cache.count("standalone")
+            return question
+
+        key = (history_digest(history), question)
+        rewritten = cache.get(key)
+        if rewritten is None:
+            rewritten = rewrite_chain.invoke(inputs)
+            cache.count("llm_calls")
+            cache.put(key, rewritten)
+        return rewritten
+
+    return (RunnableLambda(rewrite) | retriever).with_config(run_name="chat_retriever_chain")
+
+
+def describe_stats(cache):
+    stats = cache.stats
+    return (
+        f"Question rewrites: {stats['llm_calls']} LLM calls, {cache.saved_calls} saved "
+        f"({stats['no_history']} without history, {stats['standalone']} standalone, "
+        f"{stats['cache_hits']} cached)"
+    )
@@ -0,0 +1,433 @@
+import asyncio
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_groq import ChatGroq
+from pydantic import ConfigDict
+
+# Latency-aware model routing. Each request goes to the fastest healthy model
+# whose context window fits it; if the answer has not started within
+# HEDGE_AFTER seconds, the same request is also sent to the next model and the
+# first one to answer wins. Latency and error stats are kept per model for the
+# whole process, so all chains and sessions learn from each other's requests.
+# Async calls (ainvoke, abatch, astream) use the models' async clients on the
+# caller's event loop instead of worker threads.
+MODELS = {
+    # Groq model name -> context window in tokens
+    "Gemma2-9b-It": 8192,
+    "Llama3-8b-8192": 8192,
+    "Llama3-70b-8192": 8192,
+    "Mixtral-8x7b-32768": 32768,
+}
+ROUTER_MODELS = [name for name in os.getenv("ROUTER_MODELS", "").split(",") if name] or list(MODELS)
+HEDGE_AFTER = float(os.getenv("ROUTER_HEDGE_AFTER", "2.0"))  # seconds; 0 disables hedging
+STATS_WINDOW = 50
+MIN_SAMPLES = 3
+MAX_ERROR_RATE = 0.5
+COOLDOWN_SECONDS = 30.0
+# A failed call counts as this slow, so a model that keeps failing sorts
+# behind working ones once it is out of its cooldown
+FAILURE_LATENCY_SECONDS = 30.0
+REPLY_TOKENS = 1024  # reserved for the answer when max_tokens is not set
+# Sync calls in flight at once. Each may add a hedge, so the pool has a
+# worker for both and a hedge never queues behind other calls.
+MAX_CONCURRENT_CALLS = int(os.getenv("ROUTER_MAX_CONCURRENT_CALLS", "32"))
+ROUTER_EXECUTOR = ThreadPoolExecutor(max_workers=2 * MAX_CONCURRENT_CALLS, thread_name_prefix="model-router")
+
+
+class BackendStats:
+    def __init__(self):
+        self._outcomes = deque(maxlen=STATS_WINDOW)  # (latency, ok)
+        self._lock = threading.Lock()
+        self.unhealthy_until = 0.0
+
+    def record(self, latency, ok):
+        with self._lock:
+            self._outcomes.append((latency, ok))
+            if not ok and len(self._outcomes) >= MIN_SAMPLES and self.error_rate > MAX_ERROR_RATE:
+                # Sit out for a while, then get probed again by live traffic
+                self.unhealthy_until = time.time() + COOLDOWN_SECONDS
+
+    @property
+    def error_rate(self):
+        if not self._outcomes:
+            return 0.0
+        return sum(not ok for _, ok in self._outcomes) / len(self._outcomes)
+
+    @property
+    def latency(self):
+        # Median latency of recent calls, failures counted as
+        # FAILURE_LATENCY_SECONDS; 0 until there are enough samples, so new
+        # models get tried before the router settles on one
+        latencies = sorted(
+            latency if ok else max(latency, FAILURE_LATENCY_SECONDS) for latency, ok in self._outcomes
+        )
+        if len(latencies) < MIN_SAMPLES:
+            return 0.0
+        return latencies[len(latencies) // 2]
+
+    @property
+    def healthy(self):
+        return time.time() >= self.unhealthy_until
+
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def stats_for(model):
+    with _stats_lock:
+        return _stats.setdefault(model, BackendStats())
+
+
+def estimate_tokens(messages):
+    # Rough upper bound (about 3 characters per token) plus per-message overhead
+    return sum(len(str(message.content)) // 3 + 4 for message in messages)
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _client(groq_api_key, model, llm_kwargs):
+    # Building a client sets up TLS for its sync and async HTTP pools, so
+    # clients are shared by every router and rerun in the process
+    key = (groq_api_key, model, tuple(sorted(llm_kwargs.items())))
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = ChatGroq(groq_api_key=groq_api_key, model_name=model, **llm_kwargs)
+        return _clients[key]
+
+
+class Backend:
+    def __init__(self, name, groq_api_key, llm_kwargs, context_window):
+        self.name = name
+        self.groq_api_key = groq_api_key
+        self.llm_kwargs = llm_kwargs
+        self.context_window = context_window
+        self.stats = stats_for(name)
+
+    @property
+    def llm(self):
+        # Created on first use, so models that are never routed to cost nothing
+        return _client(self.groq_api_key, self.name, self.llm_kwargs)
+
+
+class CallStart:
+    # Marked by a worker when the call it was submitted for starts running
+    def __init__(self):
+        self._event = threading.Event()
+        self.at = None
+
+    def mark(self):
+        self.at = time.perf_counter()
+        self._event.set()
+
+    def hedge_timeout(self, hedge_after):
+        # Seconds until the call is due a hedge. Time spent queued for a
+        # worker does not count, so a busy pool never triggers more work.
+        self._event.wait()
+        return max(self.at + hedge_after - time.perf_counter(), 0.0)
+
+
+class RoutedChatModel(BaseChatModel):
+    backends: list
+    hedge_after: Optional[float] = HEDGE_AFTER
+    reply_tokens: int = REPLY_TOKENS
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    @property
+    def _llm_type(self):
+        return "routed-chat-model"
+
+    def route(self, messages):
+        # Candidates that fit the prompt, healthy ones first, then fastest first
+        needed = estimate_tokens(messages) + self.reply_tokens
+        fitting = [backend for backend in self.backends if backend.context_window >= needed]
+        if not fitting:
+            # Nothing fits by the estimate; let the largest window try
+            fitting = [max(self.backends, key=lambda backend: backend.context_window)]
+        return sorted(fitting, key=lambda backend: (not backend.stats.healthy, backend.stats.latency))
+
+    @staticmethod
+    def _result(backend, message):
+        message.response_metadata["routed_to"] = backend.name
+        return ChatResult(generations=[ChatGeneration(message=message)], llm_output={"model_name": backend.name})
+
+    def _call(self, backend, messages, stop, kwargs, started, answered):
+        started.mark()
+        if answered.is_set():
+            # A hedge that got a worker only after the race was won
+            return None
+        try:
+            message = backend.llm.invoke(messages, stop=stop, **kwargs)
+        except Exception:
+            backend.stats.record(time.perf_counter() - started.at, False)
+            raise
+        backend.stats.record(time.perf_counter() - started.at, True)
+        answered.set()
+        return backend, message
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        candidates = deque(self.route(messages))
+        in_flight = {}
+        answered = threading.Event()
+        error = None
+
+        def launch():
+            started = CallStart()
+            future = ROUTER_EXECUTOR.submit(
+                self._call, candidates.popleft(), messages, stop, kwargs, started, answered
+            )
+            in_flight[future] = started
+
+        launch()
+        try:
+            while in_flight:
+                timeout = None
+                if self.hedge_after and candidates and len(in_flight) == 1:
+                    timeout = next(iter(in_flight.values())).hedge_timeout(self.hedge_after)
+                done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+                if not done:
+                    # The primary is past its deadline: race it against the next model
+                    launch()
+                    continue
+                for future in done:
+                    del in_flight[future]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        error = e
+                        continue
+                    if result is not None:
+                        return self._result(*result)
+                if not in_flight and candidates:
+                    # Every request so far failed; fail over to the next model
+                    launch()
+            raise error
+        finally:
+            # The losers of a race are not needed any more. One still queued
+            # never runs or returns at once; a running call cannot be
+            # interrupted, and its answer is dropped with the future
+            answered.set()
+            for future in in_flight:
+                future.cancel()
+
+    async def _acall(self, backend, messages, stop, kwargs):
+        start = time.perf_counter()
+        try:
+            message = await backend.llm.ainvoke(messages, stop=stop, **kwargs)
+        except Exception:
+            backend.stats.record(time.perf_counter() - start, False)
+            raise
+        backend.stats.record(time.perf_counter() - start, True)
+        return backend, message
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        # Same routing as _generate, on the event loop; tasks start right
+        # away, so the hedge deadline counts from launch
+        candidates = deque(self.route(messages))
+        in_flight = set()
+        error = None
+
+        def launch():
+            in_flight.add(asyncio.ensure_future(self._acall(candidates.popleft(), messages, stop, kwargs)))
+
+        launch()
+        try:
+            while in_flight:
+                hedge = self.hedge_after and candidates and len(in_flight) == 1
+                done, _ = await asyncio.wait(
+                    in_flight, timeout=self.hedge_after if hedge else None, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    launch()
+                    continue
+                for task in done:
+                    in_flight.discard(task)
+                    try:
+                        backend, message = task.result()
+                    except Exception as e:
+                        error = e
+                        continue
+                    return self._result(backend, message)
+                if not in_flight and candidates:
+                    launch()
+            raise error
+        finally:
+            # The losers of a race are not needed any more
+            for task in in_flight:
+                task.cancel()
+
+    def _stream_worker(self, backend, messages, stop, kwargs, events, cancelled, started):
+        started.mark()
+        try:
+            for chunk in backend.llm.stream(messages, stop=stop, **kwargs):
+                if cancelled.is_set():
+                    # Lost the race; what it took so far is a lower bound on its latency
+                    backend.stats.record(time.perf_counter() - started.at, True)
+                    return
+                events.put((backend, chunk, None))
+        except Exception as e:
+            backend.stats.record(time.perf_counter() - started.at, False)
+            events.put((backend, None, e))
+            return
+        backend.stats.record(time.perf_counter() - started.at, True)
+        events.put((backend, None, None))
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        # The first model to produce a token wins and the others are dropped;
+        # once tokens have been emitted the answer cannot switch models
+        candidates = deque(self.route(messages))
+        events = queue.Queue()
+        running = {}
+        started = {}
+        winner = None
+        error = None
+
+        def launch():
+            backend = candidates.popleft()
+            running[backend.name] = threading.Event()
+            started[backend.name] = CallStart()
+            ROUTER_EXECUTOR.submit(
+                self._stream_worker, backend, messages, stop, kwargs, events, running[backend.name],
+                started[backend.name],
+            )
+
+        launch()
+        try:
+            while running:
+                timeout = None
+                if winner is None and self.hedge_after and candidates and len(running) == 1:
+                    timeout = started[next(iter(running))].hedge_timeout(self.hedge_after)
+                try:
+                    backend, chunk, e = events.get(timeout=timeout)
+                except queue.Empty:
+                    launch()
+                    continue
+                if winner is not None and backend.name != winner:
+                    continue
+                if chunk is None:
+                    running.pop(backend.name, None)
+                    if e is None:
+                        return
+                    if winner is not None:
+                        raise e
+                    error = e
+                    if not running and candidates:
+                        launch()
+                    continue
+                if winner is None:
+                    winner = backend.name
+                    for name, cancelled in running.items():
+                        if name != winner:
+                            cancelled.set()
+                    chunk.response_metadata["routed_to"] = winner
+                generation = ChatGenerationChunk(message=chunk)
+                if run_manager:
+                    run_manager.on_llm_new_token(generation.text, chunk=generation)
+                yield generation
+            if error is not None:
+                raise error
+        finally:
+            for cancelled in running.values():
+                cancelled.set()
+
+    async def _astream_worker(self, backend, messages, stop, kwargs, events):
+        start = time.perf_counter()
+        try:
+            async for chunk in backend.llm.astream(messages, stop=stop, **kwargs):
+                await events.put((backend, chunk, None))
+        except asyncio.CancelledError:
+            # Lost the race; what it took so far is a lower bound on its latency
+            backend.stats.record(time.perf_counter() - start, True)
+            raise
+        except Exception as e:
+            backend.stats.record(time.perf_counter() - start, False)
+            await events.put((backend, None, e))
+            return
+        backend.stats.record(time.perf_counter() - start, True)
+        await events.put((backend, None, None))
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        # Same race as _stream, with the losers cancelled outright
+        candidates = deque(self.route(messages))
+        events = asyncio.Queue()
+        running = {}
+        winner = None
+        error = None
+
+        def launch():
+            backend = candidates.popleft()
+            running[backend.name] = asyncio.ensure_future(
+                self._astream_worker(backend, messages, stop, kwargs, events)
+            )
+
+        launch()
+        try:
+            while running:
+                hedge = winner is None and self.hedge_after and candidates and len(running) == 1
+                try:
+                    backend, chunk, e = await asyncio.wait_for(events.get(), self.hedge_after if hedge else None)
+                except asyncio.TimeoutError:
+                    launch()
+                    continue
+                if winner is not None and backend.name != winner:
+                    continue
+                if chunk is None:
+                    running.pop(backend.name, None)
+                    if e is None:
+                        return
+                    if winner is not None:
+                        raise e
+                    error = e
+                    if not running and candidates:
+                        launch()
+                    continue
+                if winner is None:
+                    winner = backend.name
+                    for name, task in running.items():
+                        if name != winner:
+                            task.cancel()
+                    chunk.response_metadata["routed_to"] = winner
+                generation = ChatGenerationChunk(message=chunk)
+                if run_manager:
+                    await run_manager.on_llm_new_token(generation.text, chunk=generation)
+                yield generation
+            if error is not None:
+                raise error
+        finally:
+            for task in running.values():
+                task.cancel()
+
+
+def describe_model_stats(models=None):
+    parts = []
+    for name in models or ROUTER_MODELS:
+        stats = stats_for(name)
+        latency = f"{stats.latency:.2f} s" if stats.latency else "n/a"
+        state = "" if stats.healthy else ", cooling down"
+        parts.append(f"{name}: p50 {latency}, {stats.error_rate:.0%} errors{state}")
+    return "Models: " + "; ".join(parts)
+
+
+def create_routed_llm(groq_api_key, models=None, primary=None, hedge_after=HEDGE_AFTER, **llm_kwargs):
+    # models defaults to ROUTER_MODELS. Until every model has enough latency
+    # samples they are tried in order, primary first.
+    models = list(models or ROUTER_MODELS)
+    if primary in models:
+        models = [primary] + [name for name in models if name != primary]
+    backends = [
+        Backend(name, groq_api_key, llm_kwargs, MODELS.get(name, 8192))
+        for name in models
+    ]
+    reply_tokens = llm_kwargs.get("max_tokens") or REPLY_TOKENS
+    return RoutedChatModel(backends=backends, hedge_after=hedge_after, reply_tokens=reply_tokens)
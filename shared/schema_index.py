@@ -0,0 +1,102 @@
+import hashlib
+import os
+import re
+import threading
+
+import numpy as np
+from sqlalchemy import inspect, text
+
+# Embedding index over the database schema, used to pick the few tables that
+# matter for a question before the SQL agent starts, so it neither has to
+# explore the database nor read the schema of every table. Each table is
+# described by its name, comment, and column names and comments. The index is
+# refreshed when the database's schema version changes, and only tables that
+# are new or whose description changed are embedded again.
+TOP_K_TABLES = int(os.getenv("SCHEMA_TOP_K", "5"))
+
+
+def _words(name):
+    return name.replace("_", " ")
+
+
+def describe_tables(engine, table_names):
+    tables = {name: {"comment": "", "columns": []} for name in table_names}
+    with engine.connect() as conn:
+        if conn.dialect.name == "mysql":
+            # Two queries for the whole database instead of reflecting table by table
+            for name, comment in conn.execute(text(
+                "SELECT TABLE_NAME, TABLE_COMMENT FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE()"
+            )):
+                if name in tables:
+                    tables[name]["comment"] = comment or ""
+            for name, column, comment in conn.execute(text(
+                "SELECT TABLE_NAME, COLUMN_NAME, COLUMN_COMMENT FROM information_schema.COLUMNS "
+                "WHERE TABLE_SCHEMA = DATABASE() ORDER BY TABLE_NAME, ORDINAL_POSITION"
+            )):
+                if name in tables:
+                    tables[name]["columns"].append((column, comment or ""))
+        else:
+            inspector = inspect(conn)
+            for name, table in tables.items():
+                try:
+                    table["comment"] = inspector.get_table_comment(name).get("text") or ""
+                except NotImplementedError:
+                    pass
+                table["columns"] = [(col["name"], col.get("comment") or "") for col in inspector.get_columns(name)]
+
+    descriptions = {}
+    for name, table in tables.items():
+        columns = ", ".join(
+            f"{_words(column)} ({comment})" if comment else _words(column) for column, comment in table["columns"]
+        )
+        descriptions[name] = f"Table {_words(name)}. {table['comment']}\nColumns: {columns}"
+    return descriptions
+
+
+class SchemaIndex:
+    def __init__(self, embeddings):
+        # Each call takes the current CachedSQLDatabase (see database.py),
+        # whose schema_version tells when the index is stale. Tables whose
+        # description is unchanged keep their vectors across versions
+        self.embeddings = embeddings
+        self._lock = threading.Lock()
+        self._version = None
+        self._digests = {}
+        self._vectors = {}
+        self._snapshot = ([], None)
+
+    def refresh(self, db):
+        with self._lock:
+            version = db.schema_version
+            if version == self._version:
+                return
+            names = sorted(db.get_usable_table_names())
+            descriptions = describe_tables(db._engine, names)
+            digests = {
+                name: hashlib.sha256(description.encode("utf-8")).hexdigest()
+                for name, description in descriptions.items()
+            }
+            changed = [name for name in names if self._digests.get(name) != digests[name]]
+            if changed:
+                for name, vector in zip(changed, self.embeddings.embed_documents([descriptions[name] for name in changed])):
+                    vector = np.asarray(vector, dtype=np.float32)
+                    self._vectors[name] = vector / (np.linalg.norm(vector) or 1.0)
+            self._vectors = {name: self._vectors[name] for name in names}
+            self._digests = digests
+            self._snapshot = (names, np.stack([self._vectors[name] for name in names]) if names else None)
+            self._version = version
+
+    def relevant_tables(self, db, question, k=TOP_K_TABLES):
+        # Tables named in the question first, then the closest by embedding
+        self.refresh(db)
+        names, matrix = self._snapshot
+        if len(names) <= k:
+            return list(names)
+        mentioned = [
+            name for name in names
+            if re.search(rf"\b({re.escape(name)}|{re.escape(_words(name))})\b", question, re.IGNORECASE)
+        ]
+        query = np.asarray(self.embeddings.embed_query(question), dtype=np.float32)
+        scores = matrix @ (query / (np.linalg.norm(query) or 1.0))
+        ranked = [names[i] for i in np.argsort(-scores)]
+        return list(dict.fromkeys(mentioned + ranked))[:max(k, len(mentioned))]
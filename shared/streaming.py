@@ -0,0 +1,46 @@
+import time
+
+# Streams the answer of a retrieval chain token by token. Retrieved documents
+# are handed to on_context as soon as retrieval finishes, before the first
+# answer token arrives.
+
+
+def stream_answer(chain, inputs, config, on_context, timings):
+    start = time.perf_counter()
+    for chunk in chain.stream(inputs, config=config):
+        if "context" in chunk:
+            timings["retrieval"] = time.perf_counter() - start
+            on_context(chunk["context"])
+        token = chunk.get("answer")
+        if token:
+            if "ttft" not in timings:
+                timings["ttft"] = time.perf_counter() - start
+            yield token
+    timings["total"] = time.perf_counter() - start
+
+
+def _timestamp(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes:02d}:{seconds:02d}"
+
+
+def describe_source(doc):
+    metadata = doc.metadata
+    label = metadata.get("source", "document")
+    if "page" in metadata:
+        label += f", page {metadata['page'] + 1}"
+    if "start" in metadata:
+        label += f", {_timestamp(metadata['start'])}-{_timestamp(metadata['end'])}"
+    return label
+
+
+def describe_timings(timings):
+    parts = []
+    if "retrieval" in timings:
+        parts.append(f"retrieval {timings['retrieval']:.2f} s")
+    if "ttft" in timings:
+        parts.append(f"first token {timings['ttft']:.2f} s")
+    if "total" in timings:
+        parts.append(f"total {timings['total']:.2f} s")
+    return "Timings: " + ", ".join(parts)
@@ -0,0 +1,10 @@
+import re
+
+# Approximate token counting used for prompt budgets. Each word and each
+# punctuation mark counts as one token, which tracks the BPE counts of the Groq
+# models closely enough for budgeting without loading a tokenizer.
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+def count_tokens(text):
+    return len(TOKEN_PATTERN.findall(text))
@@ -0,0 +1,83 @@
+import os
+import sys
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, "Clinical_Trial_AI_Assistant-main", "Clinical_Trial_AI_Assistant-main",
+                                "Clinical_2"))
+
+import aggregates  # noqa: E402
+from aggregates import AggregateRefresher  # noqa: E402
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'trials.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE participants (id INTEGER PRIMARY KEY, trial_id INT, arm VARCHAR(20), "
+                          "gender VARCHAR(10), age INT, dropped_out INT, dropout_reason VARCHAR(100))"))
+        conn.execute(text("CREATE TABLE adverse_events (id INTEGER PRIMARY KEY, participant_id INT, "
+                          "severity VARCHAR(20))"))
+        conn.execute(text("CREATE TABLE quality_of_life (id INTEGER PRIMARY KEY, participant_id INT, score INT)"))
+    return engine
+
+
+def _participants(engine, *ids):
+    with engine.begin() as conn:
+        for n in ids:
+            conn.execute(text("INSERT INTO participants VALUES (:id, 1, 'placebo', 'F', 40, 0, NULL)"), {"id": n})
+
+
+def _events(engine, *pairs):
+    with engine.begin() as conn:
+        for n, participant in pairs:
+            conn.execute(text("INSERT INTO adverse_events VALUES (:id, :participant, 'mild')"),
+                         {"id": n, "participant": participant})
+
+
+def _count(engine, table, measure):
+    with engine.connect() as conn:
+        return conn.execute(text(f"SELECT COALESCE(SUM({measure}), 0) FROM {table}")).scalar()
+
+
+def test_tables_are_only_created_when_asked(engine):
+    refresher = AggregateRefresher(engine)
+    refresher.setup()
+    assert refresher.available == []
+    assert "summary_dropouts" not in inspect(engine).get_table_names()
+    refresher.setup(create=True)
+    assert len(refresher.available) == 4
+    assert AggregateRefresher(engine).setup() is None
+
+
+def test_late_rows_are_counted(engine, monkeypatch):
+    monkeypatch.setattr(aggregates, "SAFETY_IDS", 5)
+    refresher = AggregateRefresher(engine)
+    refresher.setup(create=True)
+    _participants(engine, *range(1, 21), 22)
+    refresher.refresh()
+    # Id 21 commits after 22 has been seen
+    _participants(engine, 21)
+    refresher.refresh()
+    assert _count(engine, "summary_dropouts", "participants") == 22
+    _participants(engine, *range(23, 40))
+    refresher.refresh()
+    assert _count(engine, "summary_dropouts", "participants") == 39
+    assert _count(engine, "summary_demographics", "participants") == 39
+
+
+def test_events_stored_before_their_participant_are_counted(engine, monkeypatch):
+    monkeypatch.setattr(aggregates, "SAFETY_IDS", 0)
+    refresher = AggregateRefresher(engine)
+    refresher.setup(create=True)
+    _participants(engine, 1)
+    _events(engine, (1, 1), (2, 2), (3, 1))
+    refresher.refresh()
+    assert _count(engine, "summary_adverse_events", "events") == 2
+    _participants(engine, 2)
+    refresher.refresh()
+    assert _count(engine, "summary_adverse_events", "events") == 3
+    refresher.rebuild()
+    assert _count(engine, "summary_adverse_events", "events") == 3
@@ -0,0 +1,20 @@
+from sqlalchemy import create_engine, text
+
+from shared import database
+
+
+def test_schema_change_gives_a_fresh_database(monkeypatch, tmp_path):
+    monkeypatch.setattr(database, "SCHEMA_CHECK_SECONDS", 0)
+    engine = create_engine(f"sqlite:///{tmp_path / 'school.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE students (id INTEGER PRIMARY KEY)"))
+        conn.execute(text("CREATE TABLE bookkeeping (id INTEGER PRIMARY KEY)"))
+    db = database.get_sql_database(engine, "school", hidden_tables=("bookkeeping",))
+    assert db.get_usable_table_names() == ["students"]
+    assert database.get_sql_database(engine, "school", hidden_tables=("bookkeeping",)) is db
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE teachers (id INTEGER PRIMARY KEY)"))
+    fresh = database.get_sql_database(engine, "school", hidden_tables=("bookkeeping",))
+    assert fresh is not db and fresh.schema_version != db.schema_version
+    assert fresh.get_usable_table_names() == ["students", "teachers"]
+    assert "CREATE TABLE teachers" in fresh.get_table_info()
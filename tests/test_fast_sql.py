@@ -0,0 +1,23 @@
+from langchain_community.utilities import SQLDatabase
+from langchain_core.runnables import RunnableLambda
+from sqlalchemy import create_engine, text
+
+from shared.fast_sql import fast_answer
+
+
+def test_guidance_helps_write_the_query_but_is_not_answered():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE students (id INTEGER PRIMARY KEY)"))
+    prompts = []
+
+    def llm(prompt):
+        prompts.append(prompt.to_messages())
+        return "SELECT COUNT(*) FROM students" if len(prompts) == 1 else "None."
+
+    answer, sql, result = fast_answer(RunnableLambda(llm), SQLDatabase(engine), "How many students?",
+                                      guidance="Count rows of students.")
+    (generate_system, generate_question), (answer_system, answer_question) = prompts
+    assert "Count rows of students." in generate_system.content
+    assert generate_question.content == answer_question.content == "How many students?"
+    assert "Count rows of students." not in answer_system.content
@@ -0,0 +1,76 @@
+import pytest
+from langchain_community.utilities import SQLDatabase
+from sqlalchemy import create_engine, text
+
+from shared import guardrails
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT REPLACE(name, ' ', '') FROM students",
+    "SELECT replace (name, 'a', 'b') FROM students",
+    "SELECT INSERT(name, 1, 2, 'xx') FROM students",
+    "SELECT name FROM students WHERE note = 'DELETE everything'",
+])
+def test_select_with_string_functions_is_allowed(sql):
+    assert guardrails.validate_sql(sql) is None
+
+
+@pytest.mark.parametrize("sql", [
+    "REPLACE INTO students VALUES ('a')",
+    "WITH t AS (SELECT 1) DELETE FROM students",
+    "SELECT 1; INSERT INTO students VALUES ('a')",
+    "UPDATE students SET name = 'a'",
+    "SELECT name FROM students INTO OUTFILE '/tmp/students.csv'",
+    "SELECT name INTO DUMPFILE '/tmp/students' FROM students",
+    "SELECT COUNT(*) INTO @n FROM students",
+    "SELECT name FROM students FOR UPDATE",
+    "SELECT name FROM students FOR SHARE",
+    "SELECT name FROM students LOCK IN SHARE MODE",
+])
+def test_writes_are_rejected(sql):
+    assert guardrails.validate_sql(sql) is not None
+
+
+def _database(rows):
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE students (id INTEGER PRIMARY KEY, name VARCHAR(20))"))
+        conn.execute(text("INSERT INTO students VALUES (:id, :name)"),
+                     [{"id": n, "name": f"Student {n}"} for n in range(rows)])
+
+    class GuardedDatabase(guardrails.SQLGuard, SQLDatabase):
+        pass
+
+    return GuardedDatabase(engine)
+
+
+def test_own_larger_limit_is_reported_as_truncated():
+    db = _database(guardrails.MAX_RESULT_ROWS + 50)
+    result = db.run("SELECT id FROM students LIMIT 500")
+    assert f"Only the first {guardrails.MAX_RESULT_ROWS} rows" in result
+
+
+def test_own_limit_does_not_lift_the_row_cap():
+    db = _database(guardrails.MAX_RESULT_ROWS + 50)
+    rows = db._execute(db.guard_sql("SELECT id FROM students ORDER BY id DESC LIMIT 1000000"))
+    assert len(rows) == guardrails.MAX_RESULT_ROWS + 1
+    assert rows[0]["id"] == guardrails.MAX_RESULT_ROWS + 49
+
+
+def test_union_cost_is_the_sum_of_its_parts():
+    def part(cost):
+        return {"query_block": {"cost_info": {"query_cost": str(cost)}}}
+
+    plan = {"query_block": {"union_result": {"query_specifications": [part(600000), part(700000)]}}}
+    assert guardrails.explain_estimates(plan)[0] == 1300000
+
+
+def test_added_limit_is_reported_as_truncated():
+    db = _database(guardrails.MAX_RESULT_ROWS + 1)
+    assert "Only the first" in db.run("SELECT id FROM students")
+    assert "Only the first" not in db.run("SELECT id FROM students LIMIT 10")
+
+
+def test_replace_function_runs():
+    db = _database(1)
+    assert db.run("SELECT REPLACE(name, ' ', '') FROM students") == "[('Student0',)]"
@@ -0,0 +1,77 @@
+import threading
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.runnables import RunnableLambda
+
+from shared.history import CompactingChatHistory, StoredChatHistory, open_history_store
+
+
+class Summarizer:
+    # Stands in for the summarize chain; holds each call until released
+    def __init__(self):
+        self.calls = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, inputs):
+        self.calls.append(inputs["new_lines"])
+        self.started.set()
+        self.release.wait(5)
+        return f"summary {len(self.calls)}"
+
+    def chain(self):
+        return RunnableLambda(self)
+
+
+@pytest.fixture(params=["sqlite", "file"])
+def store(request, tmp_path):
+    return open_history_store(request.param, str(tmp_path / "history"))
+
+
+def _turns(count):
+    messages = []
+    for n in range(count):
+        messages += [HumanMessage(content=f"question {n} " * 5), AIMessage(content=f"answer {n} " * 5)]
+    return messages
+
+
+def _history(store, summarizer):
+    return CompactingChatHistory(StoredChatHistory(store, "s"), token_budget=40, summarize_chain=summarizer.chain())
+
+
+def test_summary_is_kept_with_the_session(store):
+    summarizer = Summarizer()
+    summarizer.release.set()
+    history = _history(store, summarizer)
+    history.add_messages(_turns(4))
+    history.messages
+    history._pending.result()
+    resumed = _history(store, Summarizer())
+    assert (resumed.summary, resumed.summarized_count) == (history.summary, history.summarized_count)
+    assert resumed.summarized_count > 0
+
+
+def test_turns_stay_in_the_prompt_until_summarized(store):
+    summarizer = Summarizer()
+    history = _history(store, summarizer)
+    history.add_messages(_turns(4))
+    assert len(history.messages) == 8
+    summarizer.release.set()
+    history._pending.result()
+    assert len(history.messages) < 8
+
+
+def test_clear_drops_a_pending_summary(store):
+    summarizer = Summarizer()
+    history = _history(store, summarizer)
+    history.add_messages(_turns(4))
+    history.messages
+    pending = history._pending
+    # The summary is being written when the history is cleared
+    summarizer.started.wait(5)
+    history.clear()
+    summarizer.release.set()
+    pending.result()
+    assert (history.summary, history.summarized_count) == ("", 0)
+    assert StoredChatHistory(store, "s").load_summary() == ("", 0)
@@ -0,0 +1,50 @@
+import pytest
+from langchain_community.utilities import SQLDatabase
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from sqlalchemy import create_engine, text
+
+from shared.plan_cache import PlanCache, answer_from_plan
+
+QUESTION = "How many students are there?"
+SQL = "SELECT COUNT(*) FROM students"
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE students (id INTEGER PRIMARY KEY)"))
+        conn.execute(text("INSERT INTO students VALUES (1), (2)"))
+    return engine
+
+
+def _answer(llm, engine, cache):
+    return answer_from_plan(llm, SQLDatabase(engine), cache, "db", "v1", QUESTION)
+
+
+def test_changed_result_is_phrased_once_and_written_back(engine):
+    cache = PlanCache(":memory:")
+    cache.store("db", "v1", QUESTION, SQL, "[(2,)]", "Two students.")
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO students VALUES (3)"))
+    llm = FakeListChatModel(responses=["Three students."])
+    assert _answer(llm, engine, cache) == ("Three students.", SQL, "[(3,)]")
+    # The second hit reuses the stored answer instead of phrasing it again
+    assert _answer(FakeListChatModel(responses=[]), engine, cache) == ("Three students.", SQL, "[(3,)]")
+    assert cache.stats == {"hits": 2, "misses": 0}
+
+
+def test_result_within_ttl_is_served_without_running_the_query(engine):
+    cache = PlanCache(":memory:", result_ttl_seconds=60)
+    cache.store("db", "v1", QUESTION, SQL, "[(2,)]", "Two students.")
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE students"))
+    assert _answer(FakeListChatModel(responses=[]), engine, cache) == ("Two students.", SQL, "[(2,)]")
+
+
+def test_plan_that_no_longer_runs_is_dropped(engine):
+    cache = PlanCache(":memory:")
+    cache.store("db", "v1", QUESTION, "SELECT COUNT(*) FROM pupils", "[(2,)]", "Two students.")
+    assert _answer(FakeListChatModel(responses=[]), engine, cache) is None
+    assert cache.lookup("db", "v1", QUESTION) is None
+    assert cache.stats == {"hits": 0, "misses": 2}
@@ -0,0 +1,22 @@
+import pytest
+
+from shared.rewrite import is_standalone
+
+
+@pytest.mark.parametrize("question", [
+    "What about step 3?",
+    "And the second one?",
+    "How about the payment module requirements in detail?",
+    "Why?",
+    "What does it return on failure?",
+])
+def test_follow_ups_need_a_rewrite(question):
+    assert not is_standalone(question)
+
+
+@pytest.mark.parametrize("question", [
+    "What are the login requirements for admin users?",
+    "List the test cases for the checkout flow",
+])
+def test_standalone_questions_skip_the_rewrite(question):
+    assert is_standalone(question)
@@ -0,0 +1,140 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count
+
+import pytest
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+
+from shared import router
+
+_names = count()
+
+
+class FakeLLM:
+    # Answers with its own name after a delay; counts sync and async calls
+    def __init__(self, name, delay):
+        self.name = name
+        self.delay = delay
+        self.calls = {"sync": 0, "async": 0}
+
+    def invoke(self, messages, stop=None, **kwargs):
+        self.calls["sync"] += 1
+        time.sleep(self.delay)
+        return AIMessage(content=self.name)
+
+    async def ainvoke(self, messages, stop=None, **kwargs):
+        self.calls["async"] += 1
+        await asyncio.sleep(self.delay)
+        return AIMessage(content=self.name)
+
+    def stream(self, messages, stop=None, **kwargs):
+        self.calls["sync"] += 1
+        time.sleep(self.delay)
+        yield AIMessageChunk(content=self.name)
+
+    async def astream(self, messages, stop=None, **kwargs):
+        self.calls["async"] += 1
+        await asyncio.sleep(self.delay)
+        yield AIMessageChunk(content=self.name)
+
+
+class FakeBackend:
+    def __init__(self, delay):
+        self.name = f"fake-{next(_names)}"
+        self.context_window = 8192
+        self.stats = router.stats_for(self.name)
+        self.llm = FakeLLM(self.name, delay)
+
+
+def _model(*delays, hedge_after=0.1):
+    backends = [FakeBackend(delay) for delay in delays]
+    return router.RoutedChatModel(backends=backends, hedge_after=hedge_after), backends
+
+
+MESSAGES = [HumanMessage(content="hi")]
+
+
+def test_slow_primary_is_hedged():
+    model, (slow, fast) = _model(1.0, 0.0)
+    assert model.invoke(MESSAGES).content == fast.name
+
+
+class CountingExecutor(ThreadPoolExecutor):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.submitted = 0
+
+    def submit(self, *args, **kwargs):
+        self.submitted += 1
+        return super().submit(*args, **kwargs)
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_time_queued_for_a_worker_does_not_trigger_a_hedge(monkeypatch, stream):
+    # The only worker is busy for three hedge deadlines before the call starts
+    executor = CountingExecutor(max_workers=1)
+    monkeypatch.setattr(router, "ROUTER_EXECUTOR", executor)
+    release = threading.Event()
+    executor.submit(release.wait)
+    model, (primary, secondary) = _model(0.0, 0.0)
+    threading.Timer(0.3, release.set).start()
+    if stream:
+        assert [chunk.content for chunk in model.stream(MESSAGES)] == [primary.name]
+    else:
+        assert model.invoke(MESSAGES).content == primary.name
+    assert executor.submitted == 2
+
+
+def test_async_calls_use_async_clients():
+    model, (slow, fast) = _model(1.0, 0.0)
+    answers = asyncio.run(model.abatch([MESSAGES, MESSAGES]))
+    assert [answer.content for answer in answers] == [fast.name, fast.name]
+    assert slow.llm.calls["sync"] == fast.llm.calls["sync"] == 0
+
+
+def test_async_stream_is_hedged():
+    model, (slow, fast) = _model(1.0, 0.0)
+
+    async def collect():
+        return [chunk.content async for chunk in model.astream(MESSAGES)]
+
+    assert asyncio.run(collect()) == [fast.name]
+    assert fast.llm.calls["sync"] == 0
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_fails_over_when_every_call_fails(stream):
+    model, (broken, working) = _model(0.0, 0.0, hedge_after=None)
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("down")
+
+    broken.llm.invoke = broken.llm.stream = fail
+    if stream:
+        assert [chunk.content for chunk in model.stream(MESSAGES)] == [working.name]
+    else:
+        assert model.invoke(MESSAGES).content == working.name
+
+
+def test_failing_model_sorts_after_working_ones():
+    model, (broken, working) = _model(0.0, 0.0)
+    for _ in range(router.MIN_SAMPLES):
+        broken.stats.record(0.01, False)
+        working.stats.record(0.5, True)
+    broken.stats.unhealthy_until = 0.0
+    assert model.route(MESSAGES) == [working, broken]
+
+
+def test_queued_hedge_of_a_finished_call_is_cancelled(monkeypatch):
+    # The second worker is busy, so the hedge is still queued when the primary answers
+    executor = ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr(router, "ROUTER_EXECUTOR", executor)
+    release = threading.Event()
+    executor.submit(release.wait)
+    model, (primary, secondary) = _model(0.2, 0.0, hedge_after=0.05)
+    assert model.invoke(MESSAGES).content == primary.name
+    release.set()
+    executor.shutdown(wait=True)
+    assert secondary.llm.calls["sync"] == 0